@@ -1,25 +1,30 @@
-from flask import Flask, render_template, request, jsonify
+import time
+startup_started = time.perf_counter()
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, url_for
 from werkzeug.exceptions import BadRequest
-from scipy import ndimage
-from scipy.ndimage import gaussian_filter
-from scipy.optimize import curve_fit
-from scipy.optimize import differential_evolution
-from skimage import measure
-from skimage.measure import label, regionprops
-from skimage.morphology import remove_small_objects
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-from xgboost import XGBRegressor
-from statsmodels.tsa.arima.model import ARIMA
+from werkzeug.utils import secure_filename
 from flask_cors import CORS
-from sklearn.cluster import DBSCAN
 import calendar
-import cv2
 import base64
+import functools
+import hashlib
+import importlib
+import io
+import uuid
+import threading
+import atexit
+import tempfile
+import zipfile
+import heapq
+from collections import OrderedDict
+import multiprocessing
+import pickle
+import re
+import shutil
+import struct
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from queue import Empty
 import pandas as pd
 import numpy as np
 import math
@@ -31,12 +36,376 @@ import os
 import warnings
 from datetime import datetime
 
+core_imports_finished = time.perf_counter()
+
+class LazyImport:
+    # Stand-in for a module (or a name inside one) that is imported on first use; its own
+    # attributes are underscored so they never shadow the wrapped module's
+    def __init__(self, module, attribute=None):
+        self._module = module
+        self._attribute = attribute
+        self._target = None
+        lazy_imports.append(self)
+    
+    @property
+    def _qualified_name(self):
+        return f"{self._module}.{self._attribute}" if self._attribute else self._module
+    
+    def _resolve(self):
+        if self._target is None:
+            with lazy_import_lock:
+                if self._target is None:
+                    started = time.perf_counter()
+                    target = importlib.import_module(self._module)
+                    if self._attribute:
+                        target = getattr(target, self._attribute)
+                    # Modules already pulled in by an earlier import report (close to) zero
+                    lazy_import_timings[self._qualified_name] = time.perf_counter() - started
+                    self._target = target
+        return self._target
+    
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+    
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+lazy_imports = []
+lazy_import_timings = {}
+lazy_import_lock = threading.RLock()
+
+# Heavy dependencies are only loaded by the endpoints that need them (forecast, IV fit, thermal)
+cv2 = LazyImport('cv2')
+ndimage = LazyImport('scipy.ndimage')
+differential_evolution = LazyImport('scipy.optimize', 'differential_evolution')
+least_squares = LazyImport('scipy.optimize', 'least_squares')
+lambertw = LazyImport('scipy.special', 'lambertw')
+RandomForestRegressor = LazyImport('sklearn.ensemble', 'RandomForestRegressor')
+XGBRegressor = LazyImport('xgboost', 'XGBRegressor')
+ARIMA = LazyImport('statsmodels.tsa.arima.model', 'ARIMA')
+cKDTree = LazyImport('scipy.spatial', 'cKDTree')
+joblib = LazyImport('joblib')
+
+def preload_dependencies():
+    for lazy in lazy_imports:
+        lazy._resolve()
+
 app = Flask(__name__)
 CORS(app)
 
 app_dir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.join(app_dir, 'data', 'LTF 2024 - For Coding.csv')
 
+class LRUCache:
+    # Thread-safe in-memory cache with a size bound and per-entry time-to-live
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl and time.monotonic() - entry[0] > self.ttl):
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return entry[1] if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else None
+            }
+
+# Process pools shared by the heavy endpoints, created on first use and kept for the life of the worker.
+# A pool with a hung or dead worker is retired: new work goes to a fresh pool, and the retired one is
+# shut down once no caller has work left on it, so one request's timeout never breaks another's items
+process_pools = {}
+process_pool_users = {}  # pool -> callers holding a reference
+process_pool_start_queues = {}  # pool -> queue its workers report item start times on
+process_pool_item_starts = {}  # token of a submitted item -> wall-clock time a worker began it, or None
+retired_process_pools = set()
+process_pools_lock = threading.Lock()
+PROCESS_POOL_POLL_INTERVAL = 0.5  # seconds between checks for items that have started running
+
+# The executor marks queued items as running before a worker picks them up, so workers report
+# when they really begin an item
+pool_worker_start_queue = None
+
+def init_pool_worker(start_queue):
+    global pool_worker_start_queue
+    pool_worker_start_queue = start_queue
+
+def run_pool_item(token, fn, args):
+    pool_worker_start_queue.put((token, time.time()))
+    return fn(*args)
+
+def shutdown_process_pool(pool):
+    # A worker still busy with a timed-out item exits when that item returns
+    pool.shutdown(wait=False, cancel_futures=True)
+    process_pool_start_queues.pop(pool, None)
+
+def shutdown_process_pools():
+    with process_pools_lock:
+        pools = set(process_pools.values()) | retired_process_pools
+        process_pools.clear()
+        retired_process_pools.clear()
+    for pool in pools:
+        shutdown_process_pool(pool)
+
+atexit.register(shutdown_process_pools)
+
+class PoolSession:
+    # One caller's work on a named pool; use as a context manager so its references are released
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max_workers
+        self.pools = []
+        self.pool_of = {}  # future -> pool it was submitted to
+        self.tokens = {}  # future -> token its worker reports the start time under
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def submit(self, fn, *args):
+        with process_pools_lock:
+            pool = process_pools.get(self.name)
+            if pool is None:
+                # Spawn rather than fork so worker processes never inherit Flask's threads
+                context = multiprocessing.get_context('spawn')
+                start_queue = context.Queue()
+                pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                           initializer=init_pool_worker, initargs=(start_queue,))
+                process_pools[self.name] = pool
+                process_pool_start_queues[pool] = start_queue
+            if pool not in self.pools:
+                self.pools.append(pool)
+                process_pool_users[pool] = process_pool_users.get(pool, 0) + 1
+        token = uuid.uuid4().hex
+        process_pool_item_starts[token] = None
+        try:
+            future = pool.submit(run_pool_item, token, fn, args)
+        except BrokenProcessPool:
+            del process_pool_item_starts[token]
+            self.retire(pool)
+            return self.submit(fn, *args)
+        self.pool_of[future] = pool
+        self.tokens[future] = token
+        return future
+    
+    def started_at(self, future):
+        # Wall-clock time a worker began the item, or None while it is still queued
+        return process_pool_item_starts.get(self.tokens[future])
+    
+    def collect_starts(self):
+        # Start reports are shared by every caller on a pool; record those for items still being waited on
+        for pool in self.pools:
+            start_queue = process_pool_start_queues.get(pool)
+            while start_queue is not None:
+                try:
+                    token, started = start_queue.get_nowait()
+                except (Empty, OSError, ValueError):
+                    break
+                if token in process_pool_item_starts:
+                    process_pool_item_starts[token] = started
+    
+    def retire(self, pool):
+        with process_pools_lock:
+            if process_pools.get(self.name) is pool:
+                del process_pools[self.name]
+            retired_process_pools.add(pool)
+    
+    def forget(self, future):
+        self.pool_of.pop(future, None)
+        process_pool_item_starts.pop(self.tokens.pop(future, None), None)
+    
+    def close(self):
+        with process_pools_lock:
+            finished = []
+            for pool in self.pools:
+                process_pool_users[pool] -= 1
+                if process_pool_users[pool] == 0:
+                    del process_pool_users[pool]
+                    if pool in retired_process_pools:
+                        retired_process_pools.discard(pool)
+                        finished.append(pool)
+            self.pools = []
+        for pool in finished:
+            shutdown_process_pool(pool)
+
+def drain_futures(pending, finish, timeout, session, label='item'):
+    # Wait for the next finished future(s) in pending (future -> context) and yield finish(*context, result).
+    # Each item's timeout runs from when a worker began it, not from when it was queued
+    session.collect_starts()
+    now = time.time()
+    starts = [session.started_at(future) for future in pending]
+    deadlines = [started + timeout for started in starts if started is not None]
+    wait_for = min([PROCESS_POOL_POLL_INTERVAL] + [deadline - now for deadline in deadlines])
+    done, _ = wait(pending, timeout=max(wait_for, 0), return_when=FIRST_COMPLETED)
+    
+    for future in done:
+        context = pending.pop(future)
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            session.retire(session.pool_of[future])
+            result = {'error': f"Failed to analyze {label}: worker process died ({str(e)})"}
+        except Exception as e:
+            result = {'error': f"Failed to analyze {label}: {str(e)}"}
+        session.forget(future)
+        yield finish(*context, result)
+    
+    now = time.time()
+    expired = [future for future in pending
+               if session.started_at(future) is not None and now - session.started_at(future) >= timeout]
+    for future in expired:
+        # The worker may be hung, so its pool takes no new work; other callers' items on it still finish
+        app.logger.warning(f"Timed out waiting for {label} result; retiring {session.name} worker pool")
+        context = pending.pop(future)
+        session.retire(session.pool_of[future])
+        session.forget(future)
+        yield finish(*context, {'error': f"Failed to analyze {label}: timed out after {timeout:g} seconds"})
+
+# Asynchronous jobs: with ?async=1 the long-running endpoints return a job ID at once and replay
+# the buffered request on a local thread pool; no external broker is involved
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_QUEUE_DEPTH = int(os.environ.get('JOB_QUEUE_DEPTH', 16))  # queued + running jobs before submissions are refused
+JOB_RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', 3600))
+
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+# Queued and running jobs never expire; a job moves to the finished-job cache when it completes,
+# so its TTL counts from completion
+active_jobs = {}
+jobs = LRUCache(maxsize=int(os.environ.get('JOB_HISTORY_SIZE', 1024)), ttl=JOB_RESULT_TTL)
+jobs_lock = threading.Lock()
+atexit.register(job_executor.shutdown, wait=False, cancel_futures=True)
+
+def run_job(job, view, environ, args, kwargs):
+    try:
+        job.update(status='running', started_at=time.time())
+        with app.request_context(environ):
+            response = app.make_response(view(*args, **kwargs))
+        body = response.get_data()
+        job.update(status='finished' if response.status_code < 400 else 'failed',
+                   status_code=response.status_code, mimetype=response.mimetype,
+                   result=json.loads(body) if response.is_json else body)
+    except Exception as e:
+        app.logger.error(f"Job {job['id']} failed: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        job.update(status='failed', status_code=500, mimetype='application/json', result={'error': str(e)})
+    finally:
+        job['finished_at'] = time.time()
+        with jobs_lock:
+            jobs.put(job['id'], job)
+            del active_jobs[job['id']]
+
+def submit_job(kind, view, args, kwargs):
+    job = {'id': uuid.uuid4().hex, 'kind': kind, 'status': 'queued', 'submitted_at': time.time(),
+           'started_at': None, 'finished_at': None}
+    with jobs_lock:
+        if len(active_jobs) >= JOB_QUEUE_DEPTH:
+            response = jsonify({'error': 'Job queue is full, retry later'})
+            response.headers['Retry-After'] = '5'
+            return response, 429
+        active_jobs[job['id']] = job
+    
+    # The request body is buffered so the job can re-parse it after this request has ended
+    body = request.get_data()
+    environ = dict(request.environ)
+    environ.update({'wsgi.input': io.BytesIO(body), 'CONTENT_LENGTH': str(len(body)), 'somatools.job': True})
+    
+    try:
+        job_executor.submit(run_job, job, view, environ, args, kwargs)
+    except RuntimeError as e:
+        with jobs_lock:
+            del active_jobs[job['id']]
+        return jsonify({'error': f"Job could not be queued: {str(e)}"}), 503
+    
+    response = jsonify(job_status(job))
+    response.headers['Location'] = url_for('get_job', job_id=job['id'])
+    return response, 202
+
+def async_job(kind):
+    # Route decorator: ?async=1 turns the request into a queued job
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.args.get('async') != '1' or request.environ.get('somatools.job'):
+                return view(*args, **kwargs)
+            return submit_job(kind, view, args, kwargs)
+        return wrapper
+    return decorator
+
+def find_job(job_id):
+    with jobs_lock:
+        job = active_jobs.get(job_id)
+    return job if job is not None else jobs.get(job_id)
+
+def job_status(job):
+    status = {key: job[key] for key in ('id', 'kind', 'status', 'submitted_at', 'started_at', 'finished_at')}
+    status['result_url'] = url_for('get_job_result', job_id=job['id'])
+    return status
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = find_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = find_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    if job['status'] in ('queued', 'running'):
+        return jsonify(job_status(job)), 202
+    if job['mimetype'] == 'application/json':
+        return json.dumps(job['result'], cls=NumpyEncoder), job['status_code'], {'Content-Type': 'application/json'}
+    return Response(job['result'], status=job['status_code'], mimetype=job['mimetype'])
+
+@app.route('/api/jobs', methods=['GET'])
+def job_queue_status():
+    with jobs_lock:
+        active = len(active_jobs)
+    return jsonify({'active': active, 'workers': JOB_WORKERS, 'queue_depth': JOB_QUEUE_DEPTH, 'history': jobs.stats()})
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -134,10 +503,197 @@ def pr_calculator():
 
     return render_template('pr_calculator.html')
 
+# Time-series PR for SCADA interval data, using the same temperature-corrected formula as pr_calculator
+PR_SERIES_COLUMNS = {
+    'timestamp': 'timestamp',
+    'energy': 'energy',  # kWh delivered in the interval
+    'irradiance': 'irradiance',  # mean plane-of-array irradiance over the interval, W/m2
+    'temperature': 'temperature',  # module temperature, deg C
+    'inverter': 'inverter',  # optional grouping column
+    'capacity': 'capacity'  # optional per-row installed capacity, kWp
+}
+PR_IRRADIANCE_THRESHOLD = 50  # W/m2; low-light intervals are excluded from PR
+
+def read_pr_series(file, columns=None):
+    columns = dict(PR_SERIES_COLUMNS, **(columns or {}))
+    filename = (file.filename or '').lower()
+    if filename.endswith('.parquet'):
+        try:
+            df = pd.read_parquet(file)
+        except ImportError:
+            raise ValueError("Parquet upload requires pyarrow or fastparquet on the server; upload CSV instead")
+    else:
+        wanted = set(columns.values())
+        df = pd.read_csv(file, usecols=lambda c: c in wanted)
+    
+    missing = [columns[c] for c in ('timestamp', 'energy', 'irradiance', 'temperature') if columns[c] not in df.columns]
+    if missing:
+        raise ValueError(f"Data is missing required column(s): {', '.join(missing)}")
+    
+    renamed = {columns[c]: c for c in columns if columns[c] in df.columns}
+    df = df[list(renamed)].rename(columns=renamed)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    for column in ('energy', 'irradiance', 'temperature', 'capacity'):
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(np.float64)
+    return df
+
+def calculate_pr_series(df, installed_capacity=None, temperature_coefficient=-0.0041, temperature_reference=25,
+                        irradiance_threshold=PR_IRRADIANCE_THRESHOLD, benchmark=0, interval_hours=None):
+    stc_irradiance = 1000  # W/m²
+    group_keys = ['inverter'] if 'inverter' in df.columns else []
+    df = df.sort_values(group_keys + ['timestamp'], kind='stable').reset_index(drop=True)
+    
+    if 'capacity' in df.columns:
+        capacity = df['capacity'].to_numpy()
+    elif installed_capacity is not None and installed_capacity > 0:
+        capacity = np.float64(installed_capacity)
+    else:
+        raise ValueError("installed_capacity must be a positive number when the data has no capacity column")
+    
+    # Interval length: given, or the median spacing of the timestamps (per inverter)
+    if interval_hours is None:
+        timestamps = df['timestamp'].to_numpy()
+        steps = np.diff(timestamps).astype('timedelta64[s]').astype(np.float64) / 3600
+        if group_keys:
+            codes = df['inverter'].to_numpy()
+            steps = steps[codes[1:] == codes[:-1]]
+        steps = steps[steps > 0]
+        if steps.size == 0:
+            raise ValueError("Cannot infer the interval length; provide interval_minutes")
+        interval_hours = float(np.median(steps))
+    
+    energy = df['energy'].to_numpy()
+    irradiance = df['irradiance'].to_numpy()
+    temperature = df['temperature'].to_numpy()
+    
+    temp_correction = 1 + temperature_coefficient * (temperature - temperature_reference)
+    reference_yield = irradiance * interval_hours / stc_irradiance
+    theoretical_energy = capacity * temp_correction * reference_yield
+    
+    valid = (irradiance >= irradiance_threshold) & np.isfinite(energy) & np.isfinite(theoretical_energy) & (theoretical_energy > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        interval_pr = np.where(valid, energy / theoretical_energy * 100, np.nan)
+    
+    intervals = df.assign(temperature_correction=temp_correction, reference_yield=reference_yield,
+                          theoretical_energy=theoretical_energy, performance_ratio=interval_pr, valid=valid)
+    
+    # Roll-ups are energy-weighted: PR = sum(measured) / sum(theoretical) over valid intervals
+    rollup = pd.DataFrame({
+        'day': df['timestamp'].dt.floor('D'),
+        'month': df['timestamp'].dt.to_period('M').dt.to_timestamp(),
+        'measured_energy': np.where(valid, energy, 0),
+        'theoretical_energy': np.where(valid, theoretical_energy, 0),
+        'reference_yield': np.where(valid, reference_yield, 0),
+        'valid_intervals': valid.astype(np.int64),
+        'intervals': 1
+    })
+    for key in group_keys:
+        rollup[key] = df[key].to_numpy()
+    
+    def aggregate(period):
+        grouped = rollup.groupby(group_keys + [period], sort=True)[
+            ['measured_energy', 'theoretical_energy', 'reference_yield', 'valid_intervals', 'intervals']].sum()
+        theoretical = grouped['theoretical_energy'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            grouped['performance_ratio'] = np.where(theoretical > 0, grouped['measured_energy'].to_numpy() / theoretical * 100, np.nan)
+        if benchmark > 0:
+            grouped['benchmark_difference'] = grouped['performance_ratio'] - benchmark
+        return grouped.reset_index()
+    
+    daily = aggregate('day')
+    monthly = aggregate('month')
+    
+    total_theoretical = float(rollup['theoretical_energy'].sum())
+    summary = {
+        'intervals': int(len(df)),
+        'valid_intervals': int(valid.sum()),
+        'interval_hours': interval_hours,
+        'measured_energy': float(rollup['measured_energy'].sum()),
+        'theoretical_energy': total_theoretical,
+        'performance_ratio': float(rollup['measured_energy'].sum() / total_theoretical * 100) if total_theoretical > 0 else None,
+        'irradiance_threshold': irradiance_threshold,
+        'temperature_coefficient': temperature_coefficient,
+        'temperature_reference': temperature_reference
+    }
+    if benchmark > 0 and summary['performance_ratio'] is not None:
+        difference = summary['performance_ratio'] - benchmark
+        daily_pr = daily['performance_ratio'].to_numpy()
+        summary['benchmark_comparison'] = {
+            'benchmark': benchmark,
+            'difference': difference,
+            'status': 'above' if difference >= 0 else 'below',
+            'days_below_benchmark': int(np.sum(daily_pr < benchmark)),
+            'months_below_benchmark': int(np.sum(monthly['performance_ratio'].to_numpy() < benchmark))
+        }
+    
+    return {'summary': summary, 'intervals': intervals, 'daily': daily, 'monthly': monthly}
+
+def pr_frame_to_records(frame):
+    frame = frame.copy()
+    for column in ('timestamp', 'day', 'month'):
+        if column in frame.columns:
+            frame[column] = frame[column].dt.strftime('%Y-%m-%d %H:%M:%S' if column == 'timestamp' else '%Y-%m-%d')
+    return frame.replace({np.nan: None}).to_dict(orient='records')
+
+@app.route('/api/pr_timeseries', methods=['POST'])
+@async_job('pr_timeseries')
+def pr_timeseries():
+    try:
+        if 'data' not in request.files:
+            return jsonify({'error': 'No data file provided'}), 400
+        
+        columns = {key: request.form[f'{key}_column'] for key in PR_SERIES_COLUMNS if f'{key}_column' in request.form}
+        df = read_pr_series(request.files['data'], columns)
+        
+        benchmark = float(request.form.get('benchmark', 0))
+        if benchmark < 0 or benchmark > 100:
+            raise ValueError("Benchmark PR must be between 0 and 100.")
+        interval_minutes = request.form.get('interval_minutes')
+        installed_capacity = request.form.get('installed_capacity')
+        
+        result = calculate_pr_series(
+            df,
+            installed_capacity=float(installed_capacity) if installed_capacity else None,
+            temperature_coefficient=float(request.form.get('temperature_coefficient', -0.0041)),
+            temperature_reference=float(request.form.get('temperature_reference', 25)),
+            irradiance_threshold=float(request.form.get('irradiance_threshold', PR_IRRADIANCE_THRESHOLD)),
+            benchmark=benchmark,
+            interval_hours=float(interval_minutes) / 60 if interval_minutes else None
+        )
+        
+        # Interval rows are only returned on request; a year of 5-minute data is ~100k rows per inverter
+        if request.form.get('output') == 'intervals_csv':
+            intervals = result['intervals']
+            buffer = io.StringIO()
+            intervals.to_csv(buffer, index=False)
+            return Response(buffer.getvalue(), mimetype='text/csv',
+                            headers={'Content-Disposition': 'attachment; filename=pr_intervals.csv'})
+        
+        response = {
+            'summary': result['summary'],
+            'daily': pr_frame_to_records(result['daily']),
+            'monthly': pr_frame_to_records(result['monthly'])
+        }
+        if request.form.get('include_intervals') == '1':
+            response['intervals'] = pr_frame_to_records(result['intervals'])
+        return json.dumps(response, cls=NumpyEncoder), 200, {'Content-Type': 'application/json'}
+    except ValueError as ve:
+        app.logger.error(f"Invalid PR time-series input: {str(ve)}")
+        return jsonify({'error': f"Invalid input: {str(ve)}"}), 400
+    except Exception as e:
+        app.logger.error(f"Unexpected error in PR time-series calculation: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({'error': f"An unexpected error occurred: {str(e)}"}), 500
+
 @app.route('/energy_yield_forecaster', methods=['GET', 'POST'])
 def energy_yield_forecaster():
     if request.method == 'POST':
         try:
+            # Hourly mode: simulate a full year at the given location instead of a flat daily figure
+            if request.form.get('mode') == 'hourly':
+                return jsonify(energy_yield_hourly(request.form))
+            
             # Extract and validate input data
             installed_capacity = float(request.form['installedCapacity'])
             insolation = float(request.form['insolation'])
@@ -184,6 +740,403 @@ def energy_yield_forecaster():
 
     return render_template('energy_yield_forecaster.html')
 
+# Fleet yield: monthly irradiance for arbitrary sites, interpolated on the sphere from the
+# reference locations in static/global_irradiance_data.csv
+irradiance_data_path = os.path.join(app_dir, 'static', 'global_irradiance_data.csv')
+MONTH_COLUMNS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.float64)
+EARTH_RADIUS_KM = 6371.0
+IRRADIANCE_NEIGHBOURS = 4
+IRRADIANCE_IDW_POWER = 2
+FLEET_MAX_SITES = int(os.environ.get('FLEET_MAX_SITES', 100000))
+
+irradiance_index = None
+irradiance_index_lock = threading.Lock()
+
+def lat_lon_to_unit_vectors(latitude, longitude):
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def get_irradiance_index(path=irradiance_data_path):
+    # Reference table and KD-tree over unit vectors: chord distance orders points like great-circle distance
+    global irradiance_index
+    with irradiance_index_lock:
+        if irradiance_index is None:
+            stations = pd.read_csv(path)
+            irradiance_index = {
+                'stations': stations,
+                'tree': cKDTree(lat_lon_to_unit_vectors(stations['latitude'], stations['longitude'])),
+                'monthly': stations[MONTH_COLUMNS].to_numpy(dtype=np.float64),  # kWh/m2/day
+                'optimal_angle': stations['optimal_angle'].to_numpy(dtype=np.float64)
+            }
+            app.logger.info(f"Loaded irradiance index with {len(stations)} reference locations")
+        return irradiance_index
+
+def interpolate_irradiance(latitude, longitude, method='idw', neighbours=IRRADIANCE_NEIGHBOURS):
+    index = get_irradiance_index()
+    k = 1 if method == 'nearest' else min(neighbours, len(index['stations']))
+    chord, nearest = index['tree'].query(lat_lon_to_unit_vectors(latitude, longitude), k=k)
+    chord, nearest = chord.reshape(len(chord), k), nearest.reshape(len(nearest), k)
+    distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+    
+    # Inverse-distance weights on great-circle distance; a site on top of a reference point takes it as is
+    with np.errstate(divide='ignore'):
+        weights = 1 / np.maximum(distance_km, 1e-6) ** IRRADIANCE_IDW_POWER
+    weights /= weights.sum(axis=1, keepdims=True)
+    
+    monthly = np.einsum('sk,skm->sm', weights, index['monthly'][nearest])
+    optimal_angle = np.einsum('sk,sk->s', weights, index['optimal_angle'][nearest])
+    return {
+        'monthly': monthly,
+        'optimal_angle': optimal_angle,
+        'nearest_location': index['stations']['location'].to_numpy()[nearest[:, 0]],
+        'nearest_distance_km': distance_km[:, 0]
+    }
+
+def forecast_fleet_yield(sites, efficiency, losses, method='idw'):
+    latitude = sites['latitude'].to_numpy(dtype=np.float64)
+    longitude = sites['longitude'].to_numpy(dtype=np.float64)
+    capacity = sites['capacity'].to_numpy(dtype=np.float64)
+    # Per-site efficiency/losses (in %) override the batch defaults where given
+    if 'efficiency' in sites.columns:
+        efficiency = (sites['efficiency'].astype(np.float64) / 100).fillna(efficiency).to_numpy()
+    if 'losses' in sites.columns:
+        losses = (sites['losses'].astype(np.float64) / 100).fillna(losses).to_numpy()
+    efficiency, losses = np.asarray(efficiency, dtype=np.float64), np.asarray(losses, dtype=np.float64)
+    
+    if np.any((latitude < -90) | (latitude > 90)) or np.any((longitude < -180) | (longitude > 180)):
+        raise ValueError("Latitude must be within [-90, 90] and longitude within [-180, 180]")
+    if np.any(~(capacity > 0)):
+        raise ValueError("Capacity must be a positive number for every site")
+    if np.any(~((0 < efficiency) & (efficiency <= 1))):
+        raise ValueError("System efficiency must be between 0% & 100%")
+    if np.any(~((0 <= losses) & (losses < 1))):
+        raise ValueError("Expected losses must be between 0% & 100%")
+    
+    irradiance = interpolate_irradiance(latitude, longitude, method)
+    # Same yield model as energy_yield_forecaster: kWp x kWh/m2/day x efficiency x (1 - losses), per day in month
+    performance = capacity * efficiency * (1 - losses)
+    monthly_yield = irradiance['monthly'] * DAYS_IN_MONTH * np.reshape(performance, (-1, 1))
+    annual_yield = monthly_yield.sum(axis=1)
+    
+    return {
+        'monthly_yield': monthly_yield,
+        'annual_yield': annual_yield,
+        'specific_yield': annual_yield / capacity,
+        'irradiance': irradiance
+    }
+
+def read_fleet_sites():
+    if 'sites' in request.files:
+        sites = pd.read_csv(request.files['sites'])
+        options = request.form
+    else:
+        data = request.get_json()
+        if not data or not data.get('sites'):
+            raise ValueError("No sites provided")
+        sites = pd.DataFrame(data['sites'])
+        options = data
+    
+    missing = [c for c in ('latitude', 'longitude', 'capacity') if c not in sites.columns]
+    if missing:
+        raise ValueError(f"Sites are missing required column(s): {', '.join(missing)}")
+    if len(sites) > FLEET_MAX_SITES:
+        raise ValueError(f"At most {FLEET_MAX_SITES} sites can be forecast per request")
+    return sites, options
+
+@app.route('/api/fleet_yield_forecast', methods=['POST'])
+@async_job('fleet_yield')
+def fleet_yield_forecast():
+    try:
+        sites, options = read_fleet_sites()
+        method = options.get('method', 'idw')
+        if method not in ('idw', 'nearest'):
+            raise ValueError("method must be 'idw' or 'nearest'")
+        
+        forecast = forecast_fleet_yield(sites,
+                                        efficiency=float(options.get('efficiency', 80)) / 100,
+                                        losses=float(options.get('losses', 14)) / 100,
+                                        method=method)
+        irradiance = forecast['irradiance']
+        ids = sites['id'].tolist() if 'id' in sites.columns else list(range(len(sites)))
+        months = list(calendar.month_abbr)[1:]
+        
+        # Columns are converted to Python lists once; per-row numpy indexing dominates otherwise
+        columns = zip(ids, sites['latitude'].astype(float).tolist(), sites['longitude'].astype(float).tolist(),
+                      sites['capacity'].astype(float).tolist(), irradiance['nearest_location'].tolist(),
+                      irradiance['nearest_distance_km'].tolist(), irradiance['optimal_angle'].tolist(),
+                      irradiance['monthly'].tolist(), forecast['monthly_yield'].tolist(),
+                      forecast['annual_yield'].tolist(), forecast['specific_yield'].tolist())
+        keys = ('id', 'latitude', 'longitude', 'capacity', 'nearest_location', 'nearest_distance_km', 'optimal_angle',
+                'monthly_irradiance', 'monthly_yield', 'annual_yield', 'specific_yield')
+        results = [dict(zip(keys, row)) for row in columns]
+        
+        fleet_monthly = forecast['monthly_yield'].sum(axis=0)
+        return json.dumps({
+            'months': months,
+            'sites': results,
+            'fleet': {
+                'sites': len(results),
+                'capacity': float(sites['capacity'].sum()),
+                'monthly_yield': fleet_monthly.tolist(),
+                'annual_yield': float(fleet_monthly.sum())
+            },
+            'method': method
+        }, cls=NumpyEncoder), 200, {'Content-Type': 'application/json'}
+    except KeyError as e:
+        return jsonify({'error': f"Missing required field: {str(e)}"}), 400
+    except ValueError as e:
+        return jsonify({'error': f"Invalid input: {str(e)}"}), 400
+    except BadRequest as e:
+        return jsonify({'error': f"Bad request: {str(e)}"}), 400
+    except Exception as e:
+        app.logger.error(f"Unexpected error in fleet_yield_forecast: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({'error': "An unexpected error occurred. Please try again later."}), 500
+
+# Hourly (8760) simulation: monthly irradiance is expanded with a clear-sky shape, split into beam
+# and diffuse, transposed to the module plane and derated for cell temperature; hours are local
+# standard time at each site's UTC offset (the nominal round(longitude / 15) unless given) on a
+# 365-day year
+HOURS_PER_YEAR = 8760
+HOUR_MONTH = np.repeat(np.arange(12), (DAYS_IN_MONTH * 24).astype(int))
+MONTH_START_HOURS = np.concatenate([[0], np.cumsum(DAYS_IN_MONTH * 24)[:-1]]).astype(int)
+SOLAR_CONSTANT = 1367  # W/m2
+GROUND_ALBEDO = 0.2
+NOCT = 45  # deg C
+HOURLY_SIM_CHUNK_CASES = int(os.environ.get('HOURLY_SIM_CHUNK_CASES', 256))  # site x variant cases per chunk
+
+def solar_geometry(latitude, longitude, utc_offset):
+    # Sun position for every hour of the year at each site (sites on the first axis)
+    hour_index = np.arange(HOURS_PER_YEAR)
+    day_angle = 2 * np.pi * (hour_index // 24) / 365
+    declination = (0.006918 - 0.399912 * np.cos(day_angle) + 0.070257 * np.sin(day_angle)
+                   - 0.006758 * np.cos(2 * day_angle) + 0.000907 * np.sin(2 * day_angle)
+                   - 0.002697 * np.cos(3 * day_angle) + 0.00148 * np.sin(3 * day_angle))
+    equation_of_time = 229.18 * (0.000075 + 0.001868 * np.cos(day_angle) - 0.032077 * np.sin(day_angle)
+                                 - 0.014615 * np.cos(2 * day_angle) - 0.040849 * np.sin(2 * day_angle))
+    extraterrestrial = SOLAR_CONSTANT * (1.00011 + 0.034221 * np.cos(day_angle) + 0.00128 * np.sin(day_angle)
+                                         + 0.000719 * np.cos(2 * day_angle) + 0.000077 * np.sin(2 * day_angle))
+    # Clock to solar time: equation of time plus 4 minutes per degree east of the time-zone meridian
+    longitude_correction = (np.asarray(longitude, dtype=np.float64) - 15 * np.asarray(utc_offset, dtype=np.float64)) / 15
+    solar_time = hour_index % 24 + 0.5 + equation_of_time / 60 + longitude_correction[:, np.newaxis]
+    hour_angle = np.radians(15 * (solar_time - 12))
+    
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))[:, np.newaxis]
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+    sin_zenith = np.sqrt(np.clip(1 - cos_zenith ** 2, 0, 1))
+    # Azimuth clockwise from north
+    azimuth = np.arctan2(-np.cos(declination) * np.sin(hour_angle),
+                         np.sin(declination) * np.cos(lat) - np.cos(declination) * np.sin(lat) * np.cos(hour_angle))
+    return cos_zenith, sin_zenith, azimuth, extraterrestrial
+
+def hourly_irradiance(cos_zenith, extraterrestrial, monthly_ghi):
+    # Haurwitz clear-sky shape, scaled so each month matches its mean daily GHI (kWh/m2/day)
+    sun_up = cos_zenith > 0
+    safe_cos = np.where(sun_up, cos_zenith, 1)
+    clear_sky = np.where(sun_up, 1098 * cos_zenith * np.exp(-0.057 / safe_cos), 0)
+    clear_sky_monthly = np.add.reduceat(clear_sky, MONTH_START_HOURS, axis=-1) / 1000
+    target = monthly_ghi * DAYS_IN_MONTH
+    scale = np.divide(target, clear_sky_monthly, out=np.zeros_like(target), where=clear_sky_monthly > 0)
+    ghi = clear_sky * scale[:, HOUR_MONTH]
+    
+    # Erbs diffuse fraction from the clearness index; low sun is treated as all diffuse
+    high_sun = cos_zenith > 0.065
+    clearness = np.clip(np.divide(ghi, extraterrestrial * safe_cos, out=np.zeros_like(ghi), where=high_sun), 0, 1)
+    diffuse_fraction = np.where(clearness <= 0.22, 1 - 0.09 * clearness,
+                                np.where(clearness <= 0.8,
+                                         0.9511 - 0.1604 * clearness + 4.388 * clearness ** 2
+                                         - 16.638 * clearness ** 3 + 12.336 * clearness ** 4,
+                                         0.165))
+    diffuse_fraction = np.where(high_sun, diffuse_fraction, 1)
+    dhi = ghi * diffuse_fraction
+    dni = np.divide(ghi - dhi, safe_cos, out=np.zeros_like(ghi), where=high_sun)
+    return ghi, dni, dhi
+
+def simulate_hourly_yield(latitude, longitude, capacity, monthly_ghi, tilt, azimuth, efficiency=0.8, losses=0.14,
+                          temperature_coefficient=-0.0041, ambient_temperature=25, include_hourly=False, utc_offset=None):
+    # latitude/longitude/capacity/utc_offset: (sites,); monthly_ghi: (sites, 12); tilt/azimuth: (sites, variants)
+    # in degrees with azimuth clockwise from north; ambient_temperature: scalar or 12 monthly values
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    utc_offset = np.round(longitude / 15) if utc_offset is None else np.broadcast_to(np.asarray(utc_offset, dtype=np.float64), longitude.shape)
+    capacity = np.asarray(capacity, dtype=np.float64)
+    monthly_ghi = np.asarray(monthly_ghi, dtype=np.float64)
+    tilt = np.radians(np.asarray(tilt, dtype=np.float64))
+    azimuth = np.radians(np.asarray(azimuth, dtype=np.float64))
+    ambient = np.broadcast_to(np.asarray(ambient_temperature, dtype=np.float64), (12,))[HOUR_MONTH]
+    performance = np.broadcast_to(capacity * np.asarray(efficiency) * (1 - np.asarray(losses)), latitude.shape)
+    num_sites, num_variants = tilt.shape
+    
+    monthly_yield = np.empty((num_sites, num_variants, 12))
+    annual_poa = np.empty((num_sites, num_variants))
+    annual_ghi = np.empty(num_sites)
+    hourly = np.empty((num_sites, num_variants, HOURS_PER_YEAR), dtype=np.float32) if include_hourly else None
+    
+    chunk = max(1, HOURLY_SIM_CHUNK_CASES // num_variants)
+    for start in range(0, num_sites, chunk):
+        sites = slice(start, start + chunk)
+        cos_zenith, sin_zenith, sun_azimuth, extraterrestrial = solar_geometry(latitude[sites], longitude[sites], utc_offset[sites])
+        ghi, dni, dhi = hourly_irradiance(cos_zenith, extraterrestrial, monthly_ghi[sites])
+        annual_ghi[sites] = ghi.sum(axis=-1) / 1000
+        
+        # Isotropic-sky transposition, sites x variants x hours
+        surface_tilt = tilt[sites][:, :, np.newaxis]
+        surface_azimuth = azimuth[sites][:, :, np.newaxis]
+        cos_incidence = (cos_zenith[:, np.newaxis] * np.cos(surface_tilt)
+                         + sin_zenith[:, np.newaxis] * np.sin(surface_tilt)
+                         * np.cos(sun_azimuth[:, np.newaxis] - surface_azimuth))
+        poa = (dni[:, np.newaxis] * np.clip(cos_incidence, 0, None)
+               + dhi[:, np.newaxis] * (1 + np.cos(surface_tilt)) / 2
+               + ghi[:, np.newaxis] * GROUND_ALBEDO * (1 - np.cos(surface_tilt)) / 2)
+        
+        # NOCT cell temperature and the same linear derate as the PR calculator
+        cell_temperature = ambient + (NOCT - 20) / 800 * poa
+        derate = 1 + temperature_coefficient * (cell_temperature - 25)
+        energy = performance[sites][:, np.newaxis, np.newaxis] * poa / 1000 * derate  # kWh per hour
+        
+        monthly_yield[sites] = np.add.reduceat(energy, MONTH_START_HOURS, axis=-1)
+        annual_poa[sites] = poa.sum(axis=-1) / 1000
+        if include_hourly:
+            hourly[sites] = energy
+    
+    annual_yield = monthly_yield.sum(axis=-1)
+    return {
+        'monthly_yield': monthly_yield,
+        'annual_yield': annual_yield,
+        'specific_yield': annual_yield / capacity[:, np.newaxis],
+        'annual_poa': annual_poa,
+        'annual_ghi': annual_ghi,
+        'hourly': hourly
+    }
+
+def resolve_variants(latitude, optimal_angle, variants):
+    # Default variant: the reference optimal tilt, facing the equator
+    equator_azimuth = np.where(np.asarray(latitude) >= 0, 180.0, 0.0)
+    if not variants:
+        return optimal_angle[:, np.newaxis], equator_azimuth[:, np.newaxis]
+    tilt = np.array([[v.get('tilt', np.nan) for v in variants]], dtype=np.float64).repeat(len(latitude), axis=0)
+    azimuth = np.array([[v.get('azimuth', np.nan) for v in variants]], dtype=np.float64).repeat(len(latitude), axis=0)
+    tilt = np.where(np.isnan(tilt), optimal_angle[:, np.newaxis], tilt)
+    azimuth = np.where(np.isnan(azimuth), equator_azimuth[:, np.newaxis], azimuth)
+    if np.any((tilt < 0) | (tilt > 90)) or np.any((azimuth < 0) | (azimuth > 360)):
+        raise ValueError("Tilt must be within [0, 90] degrees and azimuth within [0, 360] degrees")
+    return tilt, azimuth
+
+def energy_yield_hourly(form):
+    installed_capacity = float(form['installedCapacity'])
+    efficiency = float(form['efficiency']) / 100
+    losses = float(form['losses']) / 100
+    latitude, longitude = float(form['latitude']), float(form['longitude'])
+    if not (0 < installed_capacity <= 1000000):
+        raise ValueError("Installed capacity must be between 0 and 1000000 kWp")
+    if not (0 < efficiency <= 1):
+        raise ValueError("System efficiency must be between 0% & 100%")
+    if not (0 <= losses < 1):
+        raise ValueError("Expected losses must be between 0% & 100%")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("Latitude must be within [-90, 90] and longitude within [-180, 180]")
+    utc_offset = float(form['utc_offset']) if form.get('utc_offset') else None
+    if utc_offset is not None and not (-12 <= utc_offset <= 14):
+        raise ValueError("UTC offset must be within [-12, 14] hours")
+    
+    irradiance = interpolate_irradiance([latitude], [longitude])
+    variant = {key: float(form[key]) for key in ('tilt', 'azimuth') if form.get(key)}
+    tilt, azimuth = resolve_variants(np.array([latitude]), irradiance['optimal_angle'], [variant])
+    simulation = simulate_hourly_yield([latitude], [longitude], [installed_capacity], irradiance['monthly'],
+                                       tilt, azimuth, efficiency=efficiency, losses=losses,
+                                       utc_offset=None if utc_offset is None else [utc_offset])
+    
+    annual_yield = float(simulation['annual_yield'][0, 0])
+    return {
+        'daily_yield': annual_yield / 365,
+        'monthly_yield': annual_yield / 12,
+        'months': list(calendar.month_abbr)[1:],
+        'yearly_yields': simulation['monthly_yield'][0, 0].tolist(),
+        'annual_yield': annual_yield,
+        'tilt': float(tilt[0, 0]),
+        'azimuth': float(azimuth[0, 0])
+    }
+
+@app.route('/api/yield_simulation', methods=['POST'])
+@async_job('yield_simulation')
+def yield_simulation():
+    try:
+        sites, options = read_fleet_sites()
+        variants = options.get('variants') or []
+        if isinstance(variants, str):
+            variants = json.loads(variants)
+        ambient_temperature = options.get('ambient_temperature', 25)
+        if isinstance(ambient_temperature, str):
+            ambient_temperature = json.loads(ambient_temperature)
+        if np.size(ambient_temperature) not in (1, 12):
+            raise ValueError("ambient_temperature must be a single value or 12 monthly values")
+        include_hourly = str(options.get('include_hourly', '')).lower() in ('1', 'true')
+        
+        latitude = sites['latitude'].to_numpy(dtype=np.float64)
+        longitude = sites['longitude'].to_numpy(dtype=np.float64)
+        capacity = sites['capacity'].to_numpy(dtype=np.float64)
+        if np.any((latitude < -90) | (latitude > 90)) or np.any((longitude < -180) | (longitude > 180)):
+            raise ValueError("Latitude must be within [-90, 90] and longitude within [-180, 180]")
+        if np.any(~(capacity > 0)):
+            raise ValueError("Capacity must be a positive number for every site")
+        # Optional per-site UTC offset in hours; missing values use the nominal offset for the longitude
+        utc_offset = np.round(longitude / 15)
+        if 'utc_offset' in sites.columns:
+            utc_offset = sites['utc_offset'].astype(np.float64).fillna(pd.Series(utc_offset, index=sites.index)).to_numpy()
+            if np.any((utc_offset < -12) | (utc_offset > 14)):
+                raise ValueError("UTC offset must be within [-12, 14] hours")
+        efficiency = float(options.get('efficiency', 80)) / 100
+        losses = float(options.get('losses', 14)) / 100
+        if not (0 < efficiency <= 1):
+            raise ValueError("System efficiency must be between 0% & 100%")
+        if not (0 <= losses < 1):
+            raise ValueError("Expected losses must be between 0% & 100%")
+        
+        irradiance = interpolate_irradiance(latitude, longitude, options.get('method', 'idw'))
+        tilt, azimuth = resolve_variants(latitude, irradiance['optimal_angle'], variants)
+        simulation = simulate_hourly_yield(
+            latitude, longitude, capacity, irradiance['monthly'], tilt, azimuth,
+            efficiency=efficiency, losses=losses,
+            temperature_coefficient=float(options.get('temperature_coefficient', -0.0041)),
+            ambient_temperature=ambient_temperature, include_hourly=include_hourly, utc_offset=utc_offset)
+        
+        ids = sites['id'].tolist() if 'id' in sites.columns else list(range(len(sites)))
+        results = []
+        for i, site_id in enumerate(ids):
+            site = {
+                'id': site_id,
+                'latitude': float(latitude[i]),
+                'longitude': float(longitude[i]),
+                'capacity': float(capacity[i]),
+                'utc_offset': float(utc_offset[i]),
+                'annual_ghi': float(simulation['annual_ghi'][i]),
+                'variants': [{
+                    'tilt': float(tilt[i, v]),
+                    'azimuth': float(azimuth[i, v]),
+                    'annual_poa': float(simulation['annual_poa'][i, v]),
+                    'monthly_yield': simulation['monthly_yield'][i, v].tolist(),
+                    'annual_yield': float(simulation['annual_yield'][i, v]),
+                    'specific_yield': float(simulation['specific_yield'][i, v])
+                } for v in range(tilt.shape[1])]
+            }
+            if include_hourly:
+                for v, variant in enumerate(site['variants']):
+                    variant['hourly_yield'] = simulation['hourly'][i, v].tolist()
+            results.append(site)
+        
+        return json.dumps({'months': list(calendar.month_abbr)[1:], 'sites': results},
+                          cls=NumpyEncoder), 200, {'Content-Type': 'application/json'}
+    except (ValueError, json.JSONDecodeError) as e:
+        return jsonify({'error': f"Invalid input: {str(e)}"}), 400
+    except BadRequest as e:
+        return jsonify({'error': f"Bad request: {str(e)}"}), 400
+    except Exception as e:
+        app.logger.error(f"Unexpected error in yield_simulation: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({'error': "An unexpected error occurred. Please try again later."}), 500
+
 @app.route('/string_fault_detector')
 def string_fault_detector():
     return render_template('string_fault_detector.html')
@@ -193,6 +1146,7 @@ def iv_curve_analyzer():
     return render_template('iv_curve_analyzer.html')
 
 @app.route('/api/analyze_iv_curve', methods=['POST'])
+@async_job('iv_curve')
 def analyze_iv_curve():
     try:
         data = request.json
@@ -201,20 +1155,229 @@ def analyze_iv_curve():
         curves = data['curves']
         irradiance = float(data['irradiance'])
         temperature = float(data['temperature'])
+        fit_method = data.get('fit_method', 'lambertw')
+        if fit_method not in FIT_METHODS:
+            raise ValueError(f"Unknown fit_method '{fit_method}'. Expected one of: {', '.join(FIT_METHODS)}")
+        curve_options = parse_curve_options(data)
         
-        results = []
-        for curve in curves:
-            result = analyze_single_curve(curve, irradiance, temperature)
-            results.append(result)
+        # Serve repeat submissions straight from the serialized result cache
+        keys = [iv_result_cache_key(curve, irradiance, temperature, fit_method, curve_options) for curve in curves]
+        serialized = [iv_result_cache.get(key) if key is not None else None for key in keys]
+        missing = [i for i, result in enumerate(serialized) if result is None]
         
-        app.logger.info(f"Analysis results: {results}")
-        return jsonify(results)
+        results = analyze_curves([curves[i] for i in missing], irradiance, temperature, fit_method, curve_options)
+        for i, result in zip(missing, results):
+            serialized[i] = json.dumps(result, cls=NumpyEncoder)
+            if keys[i] is not None and 'error' not in result:
+                iv_result_cache.put(keys[i], serialized[i])
+        
+        app.logger.info(f"Analyzed {len(missing)} curve(s), {len(curves) - len(missing)} served from cache")
+        return '[' + ','.join(serialized) + ']', 200, {'Content-Type': 'application/json'}
     except Exception as e:
         app.logger.error(f"Error in analyze_iv_curve: {str(e)}")
         app.logger.error(traceback.format_exc())
         return jsonify([{'error': str(e)}]), 500
+
+# Serialized per-curve results, keyed by a hash of the measurements and test conditions
+iv_result_cache = LRUCache(maxsize=int(os.environ.get('IV_RESULT_CACHE_SIZE', 512)),
+                           ttl=float(os.environ.get('IV_RESULT_CACHE_TTL', 3600)))
+
+def iv_result_cache_key(curve, irradiance, temperature, fit_method, curve_options):
+    try:
+        measurements = np.ascontiguousarray(curve['measurements'], dtype=np.float64)
+        conditions = (float(curve['voc']), float(curve['isc']), float(curve['pmax']),
+                      irradiance, temperature, fit_method, curve.get('cells_in_series'),
+                      sorted((curve_options or {}).items()))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None  # Invalid curves are analyzed (and rejected) every time
+    digest = hashlib.sha256(measurements.tobytes())
+    digest.update(repr((measurements.shape, conditions)).encode('utf-8'))
+    return digest.hexdigest()
+
+@app.route('/api/iv_curve_cache', methods=['GET'])
+def iv_curve_cache_status():
+    return jsonify(iv_result_cache.stats())
+
+# Bulk ingestion: rows read per CSV chunk
+IV_BULK_CHUNK_ROWS = int(os.environ.get('IV_BULK_CHUNK_ROWS', 50000))
+
+def build_bulk_curve(measurements, voc=None, isc=None, pmax=None, cells_in_series=None):
+    measurements = np.asarray(measurements, dtype=np.float64)
+    measurements = measurements[~np.isnan(measurements).any(axis=1)]
+    
+    # Fall back to values read off the trace when the file does not carry them
+    curve = {
+        'measurements': measurements,
+        'voc': voc if voc is not None else float(np.max(measurements[:, 0], initial=0)),
+        'isc': isc if isc is not None else float(np.max(measurements[:, 1], initial=0)),
+        'pmax': pmax if pmax is not None else float(np.max(measurements[:, 0] * measurements[:, 1], initial=0))
+    }
+    if cells_in_series is not None:
+        curve['cells_in_series'] = int(cells_in_series)
+    return curve
+
+def iter_curves_from_csv(stream, chunksize=None):
+    # Long format, one row per point: curve_id, voltage, current[, voc, isc, pmax, cells_in_series].
+    # Rows of a curve must be contiguous; a curve may straddle chunk boundaries.
+    def finish(curve_id, blocks):
+        block = pd.concat(blocks) if len(blocks) > 1 else blocks[0]
+        extras = {}
+        for key in ('voc', 'isc', 'pmax', 'cells_in_series'):
+            if key in block.columns and pd.notna(block[key].iloc[0]):
+                extras[key] = float(block[key].iloc[0])
+        return numpy_to_python(curve_id), build_bulk_curve(block[['voltage', 'current']].to_numpy(), **extras)
+    
+    current_id, blocks = None, []
+    for chunk in pd.read_csv(stream, chunksize=chunksize or IV_BULK_CHUNK_ROWS):
+        missing = {'curve_id', 'voltage', 'current'} - set(chunk.columns)
+        if missing:
+            raise ValueError(f"CSV is missing required column(s): {', '.join(sorted(missing))}")
+        
+        ids = chunk['curve_id'].to_numpy()
+        boundaries = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(chunk)]):
+            if blocks and ids[start] != current_id:
+                yield finish(current_id, blocks)
+                blocks = []
+            current_id = ids[start]
+            blocks.append(chunk.iloc[start:end])
+    if blocks:
+        yield finish(current_id, blocks)
+
+def iter_curves_from_npz(stream):
+    # Arrays voltage and current of shape (curves, points), NaN-padded, with optional
+    # per-curve curve_id, voc, isc, pmax and cells_in_series
+    with np.load(stream, allow_pickle=False) as npz:
+        if 'voltage' not in npz.files or 'current' not in npz.files:
+            raise ValueError("NPZ file must contain 'voltage' and 'current' arrays")
+        voltage, current = npz['voltage'], npz['current']
+        if voltage.ndim != 2 or voltage.shape != current.shape:
+            raise ValueError("NPZ 'voltage' and 'current' must be 2D arrays of the same shape")
+        
+        ids = npz['curve_id'] if 'curve_id' in npz.files else np.arange(voltage.shape[0])
+        extras = {key: npz[key] for key in ('voc', 'isc', 'pmax', 'cells_in_series') if key in npz.files}
+        for i in range(voltage.shape[0]):
+            curve = build_bulk_curve(np.column_stack((voltage[i], current[i])),
+                                     **{key: float(values[i]) for key, values in extras.items()})
+            yield numpy_to_python(ids[i]), curve
+
+def stream_curve_analyses(curve_iter, irradiance, temperature, fit_method, curve_options=None):
+    # Yield one NDJSON line per curve as soon as its analysis is available
+    def line(curve_id, serialized):
+        return f'{{"curve_id": {json.dumps(curve_id)}, "result": {serialized}}}\n'
+    
+    def finish(curve_id, key, result):
+        serialized = json.dumps(result, cls=NumpyEncoder)
+        if key is not None and 'error' not in result:
+            iv_result_cache.put(key, serialized)
+        return line(curve_id, serialized)
+    
+    pending = {}
+    try:
+        with PoolSession('iv_curve', IV_POOL_WORKERS) as session:
+            for curve_id, curve in curve_iter:
+                key = iv_result_cache_key(curve, irradiance, temperature, fit_method, curve_options)
+                serialized = iv_result_cache.get(key) if key is not None else None
+                if serialized is not None:
+                    yield line(curve_id, serialized)
+                    continue
+                
+                if IV_POOL_WORKERS <= 1:
+                    yield finish(curve_id, key, analyze_single_curve(curve, irradiance, temperature, fit_method, curve_options))
+                    continue
+                
+                future = session.submit(analyze_single_curve, curve, irradiance, temperature, fit_method, curve_options)
+                pending[future] = (curve_id, key)
+                # Keep parsing bounded by the pool: wait for a slot before reading more curves
+                while len(pending) >= 2 * IV_POOL_WORKERS:
+                    yield from drain_futures(pending, finish, IV_CURVE_TIMEOUT, session, 'curve')
+            
+            while pending:
+                yield from drain_futures(pending, finish, IV_CURVE_TIMEOUT, session, 'curve')
+    except Exception as e:
+        app.logger.error(f"Error in bulk I-V analysis: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        yield json.dumps({'error': str(e)}) + '\n'
+
+@app.route('/api/analyze_iv_curves_bulk', methods=['POST'])
+def analyze_iv_curves_bulk():
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+    
+    file = request.files['file']
+    try:
+        irradiance = float(request.form['irradiance'])
+        temperature = float(request.form['temperature'])
+        fit_method = request.form.get('fit_method', 'lambertw')
+        if fit_method not in FIT_METHODS:
+            raise ValueError(f"Unknown fit_method '{fit_method}'. Expected one of: {', '.join(FIT_METHODS)}")
+        curve_options = parse_curve_options(request.form)
+        
+        file_format = request.form.get('format') or os.path.splitext(file.filename or '')[1].lstrip('.').lower()
+        if file_format not in ('csv', 'npz'):
+            raise ValueError("Unsupported file format. Upload a .csv or .npz file")
+    except KeyError as e:
+        return jsonify({'error': f"Missing required field: {str(e)}"}), 400
+    except ValueError as e:
+        return jsonify({'error': f"Invalid input: {str(e)}"}), 400
+    
+    # Copy the upload to a file we own; the request's stream may be closed before the response finishes
+    spool = tempfile.TemporaryFile()
+    file.save(spool)
+    spool.seek(0)
+    
+    def generate():
+        with spool:
+            curve_iter = iter_curves_from_csv(spool) if file_format == 'csv' else iter_curves_from_npz(spool)
+            yield from stream_curve_analyses(curve_iter, irradiance, temperature, fit_method, curve_options)
+    
+    app.logger.info(f"Streaming bulk I-V analysis of {file.filename}")
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+# Worker pool size and per-curve timeout for multi-curve requests
+IV_POOL_WORKERS = int(os.environ.get('IV_POOL_WORKERS', os.cpu_count() or 1))
+IV_CURVE_TIMEOUT = float(os.environ.get('IV_CURVE_TIMEOUT', 30))  # seconds per curve
+
+def analyze_curves(curves, irradiance, temperature, fit_method='lambertw', curve_options=None, timeout=None):
+    if len(curves) <= 1 or IV_POOL_WORKERS <= 1:
+        return [analyze_single_curve(curve, irradiance, temperature, fit_method, curve_options) for curve in curves]
     
-def analyze_single_curve(curve, irradiance, temperature):
+    timeout = IV_CURVE_TIMEOUT if timeout is None else timeout
+    results = [None] * len(curves)
+    with PoolSession('iv_curve', IV_POOL_WORKERS) as session:
+        pending = {session.submit(analyze_single_curve, curve, irradiance, temperature, fit_method, curve_options): (i,)
+                   for i, curve in enumerate(curves)}
+        while pending:
+            for i, result in drain_futures(pending, lambda i, result: (i, result), timeout, session, 'curve'):
+                results[i] = result
+    return results
+
+def parse_curve_options(source):
+    # Shape of the synthesized curves in the response; source is the JSON body or form
+    curve_format = source.get('curve_format', 'pairs')
+    if curve_format not in CURVE_FORMATS:
+        raise ValueError(f"Unknown curve_format '{curve_format}'. Expected one of: {', '.join(CURVE_FORMATS)}")
+    
+    num_points = int(source.get('num_points', 100))
+    if not 2 <= num_points <= 10000:
+        raise ValueError("num_points must be between 2 and 10000")
+    
+    levels = source.get('irradiance_levels', DEFAULT_IRRADIANCE_LEVELS)
+    if isinstance(levels, str):
+        levels = [level for level in levels.split(',') if level.strip()]
+    # Whole-number levels stay ints so the response echoes 200, not 200.0
+    levels = tuple(int(level) if level.is_integer() else level for level in map(float, levels))
+    if not levels or len(levels) > 50 or min(levels) <= 0:
+        raise ValueError("irradiance_levels must be 1 to 50 positive values")
+    
+    return {'curve_format': curve_format, 'num_points': num_points, 'irradiance_levels': levels}
+
+def format_curve(V, I, curve_format='pairs'):
+    if curve_format == 'columnar':
+        return {'V': V.tolist(), 'I': I.tolist()}
+    return list(zip(V.tolist(), I.tolist()))
+
+def analyze_single_curve(curve, irradiance, temperature, fit_method='lambertw', curve_options=None):
     try:
         # Input validation
         if not isinstance(curve, dict):
@@ -261,19 +1424,25 @@ def analyze_single_curve(curve, irradiance, temperature):
         if voc <= 0 or isc <= 0 or pmax <= 0:
             raise ValueError("Voc, Isc, and Pmax must be positive")
         
+        key_params = extract_key_parameters(voltage, current, voc, isc, pmax)
+        print(f"Key parameters: {key_params}")
+        
         # Perform analysis
         try:
-            fitted_params = fit_single_diode_model(voltage, current)
+            fitted_params = fit_single_diode_model(voltage, current, method=fit_method, temperature=temperature,
+                                                   key_params=key_params, cells_in_series=curve.get('cells_in_series'))
         except Exception as e:
             print(f"Fitting failed: {str(e)}. Using initial guesses.")
             fitted_params = {'I_L': np.max(current), 'I_0': 1e-9, 'R_s': 0.1, 'R_sh': 1000, 'n': 1.5}
 
         print(f"Fitted parameters: {fitted_params}")
         
-        key_params = extract_key_parameters(voltage, current, voc, isc, pmax)
-        print(f"Key parameters: {key_params}")
+        curve_options = curve_options or {}
+        curve_format = curve_options.get('curve_format', 'pairs')
+        num_points = curve_options.get('num_points', 100)
         
-        ideal_curve = generate_tailored_iv_curve(voc, isc, key_params['Vmpp'], key_params['Impp'])
+        ideal_V, ideal_I = synthesize_iv_curves(voc, isc, key_params['Vmpp'], key_params['Impp'], num_points)
+        ideal_curve = np.column_stack((ideal_V[0], ideal_I[0]))
         print(f"Ideal curve generated with {len(ideal_curve)} points")
         
         corrected_curve = correct_iv_curve(voltage, current, irradiance, temperature)
@@ -282,16 +1451,19 @@ def analyze_single_curve(curve, irradiance, temperature):
         faults = detect_faults(key_params, ideal_curve, fitted_params)
         print(f"Detected faults: {faults}")
         
-        irradiance_curves = generate_iv_curves_for_irradiances(voc, isc, key_params['Vmpp'], key_params['Impp'])
-        print(f"Generated {len(irradiance_curves)} irradiance curves")
+        irradiances, family_V, family_I = synthesize_irradiance_family(
+            voc, isc, key_params['Vmpp'], key_params['Impp'],
+            curve_options.get('irradiance_levels', DEFAULT_IRRADIANCE_LEVELS), num_points)
+        print(f"Generated {len(irradiances)} irradiance curves")
         
         return {
             'fitted_params': fitted_params,
             'key_params': key_params,
-            'ideal_curve': ideal_curve,
-            'corrected_curve': corrected_curve.tolist(),
+            'ideal_curve': format_curve(ideal_V[0], ideal_I[0], curve_format),
+            'corrected_curve': format_curve(corrected_curve[:, 0], corrected_curve[:, 1], curve_format),
             'faults': faults,
-            'irradiance_curves': [{'irradiance': irr, 'curve': crv} for irr, crv in irradiance_curves]
+            'irradiance_curves': [{'irradiance': irr, 'curve': format_curve(V, I, curve_format)}
+                                  for irr, V, I in zip(irradiances, family_V, family_I)]
         }
     
     except Exception as e:
@@ -319,27 +1491,175 @@ def single_diode_model(V, I, I_L, I_0, R_s, R_sh, n):
     return np.clip(result, 0, I_L)  # Ensure current is between 0 and I_L
 
 def single_diode_objective(params, voltage, current):
-    I_L, I_0, R_s, R_sh, n = params
+    # params is either one candidate (5,) or a whole DE population (5, S); the
+    # population is scored in a single broadcast over a (S, points) array
+    I_L, I_0, R_s, R_sh, n = (np.asarray(p)[..., np.newaxis] for p in params)
     predicted = single_diode_model(voltage, current, I_L, I_0, R_s, R_sh, n)
     residuals = current - predicted
-    return np.sum(np.abs(residuals))  # Use absolute error instead of squared error
+    return np.sum(np.abs(residuals), axis=-1)  # Use absolute error instead of squared error
+
+FIT_METHODS = ('lambertw', 'de')
+
+def thermal_voltage(temperature):
+    k = 1.380649e-23  # Boltzmann constant
+    q = 1.602176634e-19  # Elementary charge
+    return k * (temperature + 273.15) / q
 
-def fit_single_diode_model(voltage, current):
+def lambertw_of_exp(log_x):
+    # W(exp(log_x)) without overflowing exp() for large arguments
+    log_x = np.asarray(log_x, dtype=float)
+    w = np.empty_like(log_x)
+    small = log_x < 500
+    w[small] = lambertw(np.exp(log_x[small])).real
+    if np.any(~small):
+        # Asymptotic start, then Newton on w + log(w) = log_x
+        lx = log_x[~small]
+        wl = lx - np.log(lx)
+        for _ in range(3):
+            wl = wl - (wl + np.log(wl) - lx) / (1 + 1 / wl)
+        w[~small] = wl
+    return w
+
+def single_diode_current_lambertw(V, I_L, I_0, R_s, R_sh, nNsVth):
+    # Explicit solution of I = I_L - I_0*(exp((V + I*R_s)/nNsVth) - 1) - (V + I*R_s)/R_sh
+    V = np.asarray(V, dtype=float)
+    G_sh = 1 / R_sh
+    if R_s < 1e-9:
+        with np.errstate(over='ignore'):
+            return I_L - I_0 * np.expm1(np.minimum(V / nNsVth, 700)) - V * G_sh
+    
+    denom = nNsVth * (1 + R_s * G_sh)
+    log_arg = np.log(R_s * I_0 / denom) + (R_s * (I_L + I_0) + V) / denom
+    return (I_L + I_0 - V * G_sh) / (1 + R_s * G_sh) - (nNsVth / R_s) * lambertw_of_exp(log_arg)
+
+def estimate_cells_in_series(Voc):
+    # Crystalline silicon cells sit around 0.6 V open circuit at STC
+    return max(1, int(round(Voc / 0.6)))
+
+def estimate_single_diode_params(voltage, current, key_params, nNsVth_bounds):
+    Voc, Isc = key_params['Voc'], key_params['Isc']
+    Vmp, Imp = key_params['Vmpp'], key_params['Impp']
+    
+    # Shunt resistance from the slope of the flat region near short circuit
+    flat = voltage < 0.3 * Voc
+    R_sh = 1000 * Voc / Isc
+    if np.count_nonzero(flat) >= 2 and np.ptp(voltage[flat]) > 0:
+        slope = np.polyfit(voltage[flat], current[flat], 1)[0]
+        if slope < 0:
+            R_sh = -1 / slope
+    
+    # Series resistance and modified ideality from the MPP condition (R_sh -> infinity)
+    if 0 < Imp < Isc and 0 < Vmp < Voc:
+        ratio = (Isc - Imp) / Imp
+        log_term = ratio * np.log(1 - Imp / Isc)
+        R_s = (Voc - Vmp + log_term * Vmp) / (Imp * (1 + log_term))
+        if not np.isfinite(R_s) or R_s < 0:
+            R_s = 0.0
+        nNsVth = ratio * (Vmp - R_s * Imp)
+    else:
+        R_s, nNsVth = 0.0, np.mean(nNsVth_bounds)
+    nNsVth = float(np.clip(nNsVth, *nNsVth_bounds))
+    
+    I_L = Isc * (1 + R_s / R_sh)
+    I_0 = max(I_L - Voc / R_sh, 1e-12) * np.exp(-Voc / nNsVth)
+    return I_L, I_0, R_s, R_sh, nNsVth
+
+def fit_single_diode_lambertw(voltage, current, temperature=25, key_params=None, cells_in_series=None):
+    if key_params is None:
+        key_params = extract_key_parameters(voltage, current, np.max(voltage), np.max(current), np.max(voltage * current))
+    Ns = int(cells_in_series) if cells_in_series else estimate_cells_in_series(key_params['Voc'])
+    Ns_Vth = Ns * thermal_voltage(temperature)
+    n_bounds = (0.5, 2.5)
+    
+    I_L, I_0, R_s, R_sh, nNsVth = estimate_single_diode_params(voltage, current, key_params,
+                                                              (n_bounds[0] * Ns_Vth, n_bounds[1] * Ns_Vth))
+    
+    # Fit log(I_0) and log(R_sh) so all parameters are on comparable scales
+    I_max = max(np.max(current), key_params['Isc'])
+    lower = np.array([0.5 * I_max, np.log(1e-15), 0, np.log(1), n_bounds[0]])
+    upper = np.array([1.2 * I_max, np.log(1e-3), max(10, key_params['Voc'] / key_params['Isc']), np.log(1e6), n_bounds[1]])
+    x0 = np.clip([I_L, np.log(I_0), R_s, np.log(R_sh), nNsVth / Ns_Vth], lower, upper)
+    
+    def residuals(x):
+        return single_diode_current_lambertw(voltage, x[0], np.exp(x[1]), x[2], np.exp(x[3]), x[4] * Ns_Vth) - current
+    
+    result = least_squares(residuals, x0, bounds=(lower, upper), method='trf', x_scale='jac', max_nfev=200)
+    if not result.success or not np.all(np.isfinite(result.x)):
+        raise RuntimeError(f"Lambert-W fit did not converge: {result.message}")
+    
+    # The curve only constrains the product n*Ns*Vth, so n is reported only when Ns was supplied;
+    # with an estimated Ns any split between n and Ns fits equally well
+    x = result.x
+    return {
+        'I_L': x[0],
+        'I_0': np.exp(x[1]),
+        'R_s': x[2],
+        'R_sh': np.exp(x[3]),
+        'n': x[4] if cells_in_series else None,
+        'nNsVth': x[4] * Ns_Vth,
+        'cells_in_series': Ns if cells_in_series else None,
+        'rmse': float(np.sqrt(np.mean(result.fun ** 2))),
+        'method': 'lambertw'
+    }
+
+def fit_single_diode_model(voltage, current, method='lambertw', temperature=25, key_params=None, cells_in_series=None):
+    if method == 'lambertw':
+        try:
+            fitted_params = fit_single_diode_lambertw(voltage, current, temperature, key_params, cells_in_series)
+            print(f"Fitting successful. Fitted parameters: {fitted_params}")
+            return fitted_params
+        except Exception as e:
+            print(f"Warning: Lambert-W fit failed ({str(e)}). Falling back to differential evolution.")
+    elif method != 'de':
+        raise ValueError(f"Unknown fit method: {method}")
+    
+    return fit_single_diode_de(voltage, current)
+
+# Differential-evolution budget: default matches the previous maxiter=2000 at popsize=30
+DE_POPSIZE = 30
+DE_MAX_EVALUATIONS = int(os.environ.get('DE_MAX_EVALUATIONS', 2001 * DE_POPSIZE * 5))
+DE_STALL_GENERATIONS = int(os.environ.get('DE_STALL_GENERATIONS', 100))
+DE_STALL_TOLERANCE = 1e-8  # relative improvement that still counts as progress
+
+def fit_single_diode_de(voltage, current, max_evaluations=None, stall_generations=None):
     bounds = [(0, np.max(current)*1.2), (1e-12, 1e-6), (0, 10), (1, 1e6), (1, 2)]
+    max_evaluations = DE_MAX_EVALUATIONS if max_evaluations is None else max_evaluations
+    stall_generations = DE_STALL_GENERATIONS if stall_generations is None else stall_generations
+    
+    # Each generation scores popsize * len(bounds) candidates
+    maxiter = max(max_evaluations // (DE_POPSIZE * len(bounds)) - 1, 1)
+    
+    # Stop once the best objective has not improved for stall_generations generations
+    progress = {'best': np.inf, 'stalled_for': 0, 'stalled': False}
+    def stop_when_stalled(xk, convergence=None):
+        best = float(single_diode_objective(xk, voltage, current))
+        if not np.isfinite(progress['best']) or best < progress['best'] * (1 - DE_STALL_TOLERANCE):
+            progress['best'] = best
+            progress['stalled_for'] = 0
+        else:
+            progress['stalled_for'] += 1
+        progress['stalled'] = progress['stalled_for'] >= stall_generations
+        return progress['stalled']
+    
     result = differential_evolution(
-        lambda x: single_diode_objective(x, voltage, current),
+        single_diode_objective,
         bounds,
-        maxiter=2000,
-        popsize=30,
+        args=(voltage, current),
+        maxiter=maxiter,
+        popsize=DE_POPSIZE,
         tol=1e-4,
         mutation=(0.5, 1.5),
         recombination=0.7,
         updating='deferred',
-        workers=1  # Use single-threaded mode to avoid pickling issues
+        vectorized=True,  # Score the whole population in one call
+        callback=stop_when_stalled,
+        workers=1  # Curves are already spread over the I-V worker pool
     )
 
-    if result.success:
+    # A stalled or budget-limited run still returns the best candidate found
+    if result.success or progress['stalled'] or result.nit >= maxiter:
         fitted_params = dict(zip(['I_L', 'I_0', 'R_s', 'R_sh', 'n'], result.x))
+        fitted_params['method'] = 'de'
         print(f"Fitting successful. Fitted parameters: {fitted_params}")
         return fitted_params
     else:
@@ -364,38 +1684,34 @@ def extract_key_parameters(voltage, current, Voc, Isc, Pmax):
         'efficiency': efficiency
     }
 
-def generate_tailored_iv_curve(Voc, Isc, Vmp, Imp, num_points=100):
-    V = np.linspace(0, Voc, num_points)
-    knee_factor = Vmp / Voc
+CURVE_FORMATS = ('pairs', 'columnar')
+DEFAULT_IRRADIANCE_LEVELS = (200, 400, 600, 800, 1000)
+
+def synthesize_iv_curves(Voc, Isc, Vmp, Imp, num_points=100):
+    # Build one tailored curve per row of the (broadcast) inputs; returns V, I of shape (curves, num_points)
+    Voc, Isc, Vmp, Imp = (np.atleast_1d(np.asarray(x, dtype=float))[:, np.newaxis]
+                          for x in np.broadcast_arrays(Voc, Isc, Vmp, Imp))
+    V = np.linspace(0, Voc[:, 0], num_points, axis=1)
     
-    I = np.zeros_like(V)
-    for i, v in enumerate(V):
-        if v <= Vmp:
-            I[i] = Isc - (Isc - Imp) * (v / Vmp) ** 0.2
-        else:
-            I[i] = Imp * ((Voc - v) / (Voc - Vmp)) ** 3
+    with np.errstate(divide='ignore', invalid='ignore'):
+        I = np.where(V <= Vmp,
+                     Isc - (Isc - Imp) * (V / Vmp) ** 0.2,
+                     Imp * ((Voc - V) / (Voc - Vmp)) ** 3)
     
     I = np.maximum(I, 0)
-    I[-1] = 0
+    I[:, -1] = 0
     
-    return list(zip(V.tolist(), I.tolist()))
+    return V, I
 
-def generate_iv_curves_for_irradiances(Voc, Isc, Vmp, Imp, irradiances=[200, 400, 600, 800, 1000]):
+def synthesize_irradiance_family(Voc, Isc, Vmp, Imp, irradiances=DEFAULT_IRRADIANCE_LEVELS, num_points=100):
     base_irradiance = 1000  # W/m^2
-    curves = []
+    factor = np.asarray(irradiances, dtype=float) / base_irradiance
     
-    for irradiance in irradiances:
-        factor = irradiance / base_irradiance
-        scaled_Isc = Isc * factor
-        scaled_Imp = Imp * factor
-        # Voc changes logarithmically with irradiance, but the effect is small
-        scaled_Voc = Voc + 0.0257 * np.log(factor)  # Approximate Voc adjustment
-        scaled_Vmp = Vmp + 0.0257 * np.log(factor)  # Approximate Vmp adjustment
-        
-        curve = generate_tailored_iv_curve(scaled_Voc, scaled_Isc, scaled_Vmp, scaled_Imp)
-        curves.append((irradiance, curve))
+    # Voc changes logarithmically with irradiance, but the effect is small
+    voltage_shift = 0.0257 * np.log(factor)  # Approximate Voc/Vmp adjustment
+    V, I = synthesize_iv_curves(Voc + voltage_shift, Isc * factor, Vmp + voltage_shift, Imp * factor, num_points)
     
-    return curves
+    return list(irradiances), V, I
 
 def correct_iv_curve(voltage, current, G, T, G_STC=1000, T_STC=25):
     alpha = 0.04  # Current temperature coefficient (%/°C)
@@ -468,7 +1784,7 @@ def numpy_to_python(obj):
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def analyze_thermal_image(image, metadata):
+def analyze_thermal_image(image, metadata, render=True, render_inputs=None, clahe=None, panel_mask=None):
     try:
         logger.debug(f"Starting image analysis. Image shape: {image.shape}")
         logger.debug(f"Metadata: {metadata}")
@@ -479,8 +1795,9 @@ def analyze_thermal_image(image, metadata):
         else:
             gray = image
         
-        # Enhance contrast using CLAHE
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        # Enhance contrast using CLAHE (sequence sessions pass in their own instance)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
         enhanced = clahe.apply(gray)
         
         # Noise reduction
@@ -493,12 +1810,13 @@ def analyze_thermal_image(image, metadata):
         # Normalize the image to 0-1 range
         normalized = cv2.normalize(denoised, None, 0, 1, cv2.NORM_MINMAX, dtype=cv2.CV_32F)
         
-        # Panel detection
-        try:
-            panel_mask = detect_panel(normalized)
-        except Exception as e:
-            logger.error(f"Error in panel detection: {str(e)}")
-            panel_mask = np.ones(normalized.shape, dtype=np.uint8)
+        # Panel detection, unless the caller is reusing a tracked mask
+        if panel_mask is None:
+            try:
+                panel_mask = detect_panel(normalized)
+            except Exception as e:
+                logger.error(f"Error in panel detection: {str(e)}")
+                panel_mask = np.ones(normalized.shape, dtype=np.uint8)
         
         # Temperature mapping
         calibrated = map_temperatures(normalized, min_temp, max_temp)
@@ -507,26 +1825,38 @@ def analyze_thermal_image(image, metadata):
         calibrated_masked = cv2.bitwise_and(calibrated, calibrated, mask=panel_mask)
         
         # Calculate image statistics on the panel area
-        mean_panel_temp = np.mean(calibrated_masked[panel_mask > 0])
-        std_panel_temp = np.std(calibrated_masked[panel_mask > 0])
+        panel_temps = calibrated_masked[panel_mask > 0]
+        mean_panel_temp = np.mean(panel_temps)
+        std_panel_temp = np.std(panel_temps)
         
         logger.debug(f"Panel temperature statistics: mean={mean_panel_temp}, std={std_panel_temp}")
         
-        # Hotspot detection
-        hotspots = detect_hotspots(calibrated_masked, panel_mask, mean_panel_temp, std_panel_temp)
+        # Per-module statistics and hotspot detection against each module's own threshold
+        module_labels, num_modules = label_modules(panel_mask)
+        module_means, module_stds, module_counts = module_statistics(calibrated_masked, module_labels, num_modules)
+        max_hotspots = int(metadata.get('max_hotspots', MAX_HOTSPOTS))
+        hotspots = detect_hotspots(calibrated_masked, panel_mask, module_means, module_stds,
+                                   max_hotspots=max_hotspots, module_labels=module_labels)
         
-        # Create visual output
-        color_mapped = create_visual_output(calibrated_masked, hotspots, panel_mask)
+        # Keep what the overlay needs so it can be rendered later, on request
+        if render_inputs is not None:
+            render_inputs.update(calibrated=calibrated_masked, hotspots=hotspots, panel_mask=panel_mask,
+                                 panel_stats=(panel_temps.size, mean_panel_temp, std_panel_temp))
         
-        # Encode processed image
-        _, buffer = cv2.imencode('.png', color_mapped)
-        processed_image = base64.b64encode(buffer).decode('utf-8')
+        processed_image = None
+        if render:
+            # Create visual output
+            color_mapped = create_visual_output(calibrated_masked, hotspots, panel_mask)
+            
+            # Encode processed image
+            _, buffer = cv2.imencode('.png', color_mapped)
+            processed_image = base64.b64encode(buffer).decode('utf-8')
         
         # Calculate temperature distribution
-        temp_distribution = calculate_temperature_distribution(calibrated_masked[panel_mask > 0], min_temp, max_temp)
+        temp_distribution = calculate_temperature_distribution(panel_temps, min_temp, max_temp)
         
         # Interpret results
-        interpreted_results = interpret_results(hotspots, mean_panel_temp, std_panel_temp)
+        interpreted_results = interpret_results(hotspots, mean_panel_temp, std_panel_temp, module_stds)
         
         logger.debug("Image analysis completed successfully")
         
@@ -534,9 +1864,11 @@ def analyze_thermal_image(image, metadata):
             'hotspots': interpreted_results,
             'mean_temp': float(mean_panel_temp),
             'max_temp': float(np.max(calibrated_masked)),
-            'min_temp': float(np.min(calibrated_masked[panel_mask > 0])),
+            'min_temp': float(np.min(panel_temps)),
             'processed_image': processed_image,
-            'temp_distribution': temp_distribution
+            'temp_distribution': temp_distribution,
+            'modules': summarize_modules(module_labels, num_modules, module_means, module_stds,
+                                         module_counts, hotspots)
         }
         
         # Convert NumPy types to Python native types
@@ -558,40 +1890,220 @@ def analyze_thermal_image(image, metadata):
             'temp_distribution': None
         }
 
-def map_temperatures(normalized_image, min_temp, max_temp):
-    return normalized_image * (max_temp - min_temp) + min_temp
+# Radiometric input: 16-bit counts (TIFF/PNG/.npy) or float temperature arrays (.npy, in deg C)
+RADIOMETRIC_EXTENSIONS = ('.npy',)
+RADIOMETRIC_SCALE = 0.01  # Kelvin per count, the common linear-radiometric encoding
+RADIOMETRIC_OFFSET = -273.15  # Kelvin to deg C
 
-def detect_panel(image):
-    # Convert the image to 8-bit unsigned integer
-    if image.dtype != np.uint8:
-        image = (image * 255).astype(np.uint8)
+def is_radiometric_upload(filename, metadata):
+    if metadata.get('input_mode') == 'radiometric':
+        return True
+    return os.path.splitext(filename or '')[1].lower() in RADIOMETRIC_EXTENSIONS
+
+def is_radiometric_image(data):
+    # 16-bit single-channel PNG/TIFF frames hold counts, not a colour map; only the headers are read
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return len(data) > 25 and data[24] == 16 and data[25] == 0
+    if data[:4] not in (b'II*\x00', b'MM\x00*'):
+        return False
+    order = '<' if data[:2] == b'II' else '>'
+    tags = {}
+    try:
+        (offset,) = struct.unpack_from(order + 'I', data, 4)
+        (count,) = struct.unpack_from(order + 'H', data, offset)
+        for i in range(count):
+            tag, kind, n, value = struct.unpack_from(order + 'HHI4s', data, offset + 2 + 12 * i)
+            if tag in (258, 277) and kind == 3 and n == 1:  # BitsPerSample, SamplesPerPixel
+                tags[tag] = struct.unpack_from(order + 'H', value)[0]
+    except struct.error:
+        return False
+    return tags.get(258) == 16 and tags.get(277, 1) == 1
+
+def load_radiometric_image(source, metadata):
+    # source is a file path, or (archive path, member name) for a survey frame inside a ZIP
+    if isinstance(source, tuple):
+        frame_bytes = read_frame_bytes(source)
+        if source[1].lower().endswith('.npy'):
+            data = np.load(io.BytesIO(frame_bytes))
+        else:
+            data = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_ANYDEPTH | cv2.IMREAD_GRAYSCALE)
+    elif source.lower().endswith('.npy'):
+        # Not memory-mapped: the spooled file is deleted while the result is still cached
+        data = np.load(source)
+    else:
+        data = cv2.imread(source, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_GRAYSCALE)
     
-    # Otsu's thresholding
-    _, thresh = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if data is None:
+        raise ValueError("Failed to decode radiometric image")
+    if data.dtype == np.uint8:
+        raise ValueError("Radiometric input must be 16-bit or floating point, got an 8-bit image")
     
-    # Morphological operations to clean up the mask
-    kernel = np.ones((5,5), np.uint8)
-    cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-    cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_OPEN, kernel)
+    if data.ndim != 2:
+        raise ValueError("Radiometric input must be a single-channel 2D array")
     
-    # Find the largest contour (assuming it's the panel)
-    contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    if not contours:
-        return np.ones(image.shape, dtype=np.uint8)
-    panel_contour = max(contours, key=cv2.contourArea)
+    # Integer data are raw counts; floating point data are already temperatures
+    if np.issubdtype(data.dtype, np.integer):
+        scale = float(metadata.get('radiometric_scale', RADIOMETRIC_SCALE))
+        offset = float(metadata.get('radiometric_offset', RADIOMETRIC_OFFSET))
+        return data.astype(np.float32) * np.float32(scale) + np.float32(offset)
+    return np.asarray(data, dtype=np.float32)
+
+def perform_radiometric_checks(temperatures):
+    checks = []
     
-    # Create a mask for the panel
-    mask = np.zeros(image.shape, dtype=np.uint8)
-    cv2.drawContours(mask, [panel_contour], 0, 255, -1)
+    if temperatures.shape[0] < 100 or temperatures.shape[1] < 100:
+        checks.append("Image dimensions are too small")
+    if not np.all(np.isfinite(temperatures)):
+        checks.append("Temperature array contains NaN or infinite values")
+    elif np.std(temperatures) < 0.05:
+        checks.append("Image appears to be mostly uniform or blank")
     
-    return mask
+    return checks
 
-def adaptive_temperature_mapping(normalized_image, min_temp, max_temp):
-    # Calculate image statistics
-    mean_temp = np.mean(normalized_image)
-    std_temp = np.std(normalized_image)
-    
-    # Adaptive temperature mapping
+def analyze_radiometric_image(temperatures, metadata, render=True, render_inputs=None):
+    # Calibrated temperatures go straight to panel and hotspot detection: no color decode,
+    # grayscale conversion, CLAHE or min/max renormalization
+    try:
+        logger.debug(f"Starting radiometric analysis. Frame shape: {temperatures.shape}")
+        
+        # Edge-preserving noise reduction in temperature units
+        denoise_sigma = float(metadata.get('denoise_sigma', 2.0))  # deg C
+        calibrated = cv2.bilateralFilter(temperatures, 9, denoise_sigma, 75) if denoise_sigma > 0 else temperatures
+        
+        frame_min, frame_max = float(np.min(calibrated)), float(np.max(calibrated))
+        min_temp = float(metadata.get('min_temp', frame_min))
+        max_temp = float(metadata.get('max_temp', frame_max))
+        
+        # Panel detection only needs a 0-1 view of the frame
+        try:
+            panel_mask = detect_panel((calibrated - frame_min) / max(frame_max - frame_min, 1e-6))
+        except Exception as e:
+            logger.error(f"Error in panel detection: {str(e)}")
+            panel_mask = np.ones(calibrated.shape, dtype=np.uint8)
+        
+        panel = panel_mask > 0
+        calibrated_masked = np.where(panel, calibrated, 0).astype(np.float32)
+        panel_temps = calibrated[panel]
+        mean_panel_temp = np.mean(panel_temps)
+        std_panel_temp = np.std(panel_temps)
+        
+        logger.debug(f"Panel temperature statistics: mean={mean_panel_temp}, std={std_panel_temp}")
+        
+        module_labels, num_modules = label_modules(panel_mask)
+        module_means, module_stds, module_counts = module_statistics(calibrated_masked, module_labels, num_modules)
+        max_hotspots = int(metadata.get('max_hotspots', MAX_HOTSPOTS))
+        hotspots = detect_hotspots(calibrated_masked, panel_mask, module_means, module_stds,
+                                   max_hotspots=max_hotspots, module_labels=module_labels)
+        
+        if render_inputs is not None:
+            render_inputs.update(calibrated=calibrated_masked, hotspots=hotspots, panel_mask=panel_mask)
+        
+        processed_image = None
+        if render:
+            _, buffer = cv2.imencode('.png', create_visual_output(calibrated_masked, hotspots, panel_mask))
+            processed_image = base64.b64encode(buffer).decode('utf-8')
+        
+        results = {
+            'hotspots': interpret_results(hotspots, mean_panel_temp, std_panel_temp, module_stds),
+            'mean_temp': float(mean_panel_temp),
+            'max_temp': float(np.max(panel_temps)),
+            'min_temp': float(np.min(panel_temps)),
+            'processed_image': processed_image,
+            'temp_distribution': calculate_temperature_distribution(panel_temps, min_temp, max_temp),
+            'modules': summarize_modules(module_labels, num_modules, module_means, module_stds,
+                                         module_counts, hotspots),
+            'radiometric': True
+        }
+        return numpy_to_python(results)
+    except Exception as e:
+        logger.error(f"Error in analyze_radiometric_image: {str(e)}")
+        logger.error(traceback.format_exc())
+        return {
+            'error': str(e),
+            'hotspots': [],
+            'mean_temp': None,
+            'max_temp': None,
+            'min_temp': None,
+            'processed_image': None,
+            'temp_distribution': None
+        }
+
+MODULE_MIN_AREA_FRACTION = 0.2  # contours smaller than this fraction of the largest module are noise
+
+def map_temperatures(normalized_image, min_temp, max_temp):
+    return normalized_image * (max_temp - min_temp) + min_temp
+
+def threshold_panel(image, threshold=None):
+    # Otsu's thresholding unless a threshold is given, then morphological operations to clean up the mask
+    if threshold is None:
+        _, thresh = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    else:
+        _, thresh = cv2.threshold(image, threshold, 255, cv2.THRESH_BINARY)
+    
+    kernel = np.ones((5,5), np.uint8)
+    cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+    return cv2.morphologyEx(cleaned, cv2.MORPH_OPEN, kernel)
+
+def detect_panel(image):
+    # Convert the image to 8-bit unsigned integer
+    if image.dtype != np.uint8:
+        image = (image * 255).astype(np.uint8)
+    
+    cleaned = threshold_panel(image)
+    
+    # Keep every module-sized contour: anything at least a fraction of the largest one
+    contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return np.ones(image.shape, dtype=np.uint8)
+    areas = [cv2.contourArea(c) for c in contours]
+    min_area = max(areas) * MODULE_MIN_AREA_FRACTION
+    module_contours = [c for c, area in zip(contours, areas) if area >= min_area]
+    
+    # Create a mask covering all modules in the frame
+    mask = np.zeros(image.shape, dtype=np.uint8)
+    cv2.drawContours(mask, module_contours, -1, 255, -1)
+    
+    return mask
+
+def label_modules(panel_mask):
+    # One label per module, numbered in raster order
+    return ndimage.label(panel_mask > 0)
+
+def module_statistics(calibrated_image, module_labels, num_modules):
+    # Per-module pixel count, mean and std in one labelled pass (index 0 is background)
+    labels = module_labels.ravel()
+    values = calibrated_image.ravel().astype(np.float64)
+    counts = np.bincount(labels, minlength=num_modules + 1)
+    sums = np.bincount(labels, weights=values, minlength=num_modules + 1)
+    squares = np.bincount(labels, weights=values * values, minlength=num_modules + 1)
+    safe_counts = np.maximum(counts, 1)
+    means = sums / safe_counts
+    stds = np.sqrt(np.maximum(squares / safe_counts - means ** 2, 0))
+    return means, stds, counts
+
+def summarize_modules(module_labels, num_modules, means, stds, counts, hotspots):
+    hotspot_counts = np.bincount([h['module'] for h in hotspots], minlength=num_modules + 1)
+    modules = []
+    for index, bounds in enumerate(ndimage.find_objects(module_labels, num_modules), start=1):
+        if bounds is None:
+            continue
+        rows, cols = bounds
+        modules.append({
+            'module': index,
+            'bbox': (cols.start, rows.start, cols.stop - cols.start, rows.stop - rows.start),
+            'area': int(counts[index]),
+            'mean_temp': float(means[index]),
+            'std_temp': float(stds[index]),
+            'hotspot_count': int(hotspot_counts[index])
+        })
+    return modules
+
+def adaptive_temperature_mapping(normalized_image, min_temp, max_temp):
+    # Calculate image statistics
+    mean_temp = np.mean(normalized_image)
+    std_temp = np.std(normalized_image)
+    
+    # Adaptive temperature mapping
     calibrated = np.clip((normalized_image - (mean_temp - 2*std_temp)) / (4*std_temp), 0, 1)
     calibrated = calibrated * (max_temp - min_temp) + min_temp
     
@@ -631,34 +2143,70 @@ def perform_pre_analysis_checks(image, metadata):
     
     return checks
 
-def detect_hotspots(calibrated_image, panel_mask, mean_temp, std_temp):
-    # Define anomaly threshold dynamically
-    threshold = mean_temp + 2 * std_temp
+# Upper bound on hotspots reported per frame; the hottest regions are kept
+MAX_HOTSPOTS = int(os.environ.get('MAX_HOTSPOTS', 100))
+
+def detect_hotspots(calibrated_image, panel_mask, mean_temp, std_temp, min_area=5, max_hotspots=None,
+                    module_labels=None):
+    # Define anomaly threshold dynamically; with module labels, mean_temp/std_temp are per-module
+    # arrays and each module is thresholded against its own statistics
+    if module_labels is not None:
+        threshold = (np.asarray(mean_temp) + 2 * np.asarray(std_temp))[module_labels]
+    else:
+        threshold = mean_temp + 2 * std_temp
     
     # Create anomaly mask
     anomaly_mask = (calibrated_image > threshold) & (panel_mask > 0)
     
     # Label connected components
     labeled, num_features = ndimage.label(anomaly_mask)
+    if num_features == 0:
+        return []
+    
+    # Per-region statistics in one pass over the anomalous pixels
+    pixels = np.flatnonzero(labeled)
+    labels = labeled.ravel()[pixels]
+    area = np.bincount(labels, minlength=num_features + 1)
+    
+    # Filter out very small regions before any per-region work
+    keep = np.flatnonzero(area >= min_area)
+    keep = keep[keep > 0]
+    if keep.size == 0:
+        return []
+    
+    values = calibrated_image.ravel()[pixels].astype(np.float64)
+    ys, xs = np.divmod(pixels, labeled.shape[1])
+    sum_x = np.bincount(labels, weights=xs, minlength=num_features + 1)[keep]
+    sum_y = np.bincount(labels, weights=ys, minlength=num_features + 1)[keep]
+    sum_temp = np.bincount(labels, weights=values, minlength=num_features + 1)[keep]
+    max_temps = np.asarray(ndimage.maximum(calibrated_image, labeled, keep), dtype=np.float64)
+    area = area[keep]
+    # Regions never straddle modules, so any pixel gives the owning module
+    modules = None
+    if module_labels is not None:
+        modules = np.asarray(ndimage.maximum(module_labels, labeled, keep), dtype=np.int64)
+    
+    # Keep the hottest regions when there are too many, preserving label order
+    max_hotspots = MAX_HOTSPOTS if max_hotspots is None else max_hotspots
+    order = np.arange(keep.size)
+    if max_hotspots and keep.size > max_hotspots:
+        order = np.sort(np.argpartition(-max_temps, max_hotspots - 1)[:max_hotspots])
     
     hotspots = []
-    for i in range(1, num_features + 1):
-        region = (labeled == i)
-        area = np.sum(region)
-        if area < 5:  # Filter out very small regions
-            continue
-        
-        y, x = ndimage.center_of_mass(region)
-        max_temp = np.max(calibrated_image[region])
-        mean_temp_region = np.mean(calibrated_image[region])
-        
-        hotspots.append({
-            'location': (int(x), int(y)),
+    for i in order:
+        max_temp = max_temps[i]
+        hotspot = {
+            'location': (int(sum_x[i] / area[i]), int(sum_y[i] / area[i])),
             'max_temp': float(max_temp),
-            'mean_temp': float(mean_temp_region),
-            'delta_t': float(max_temp - mean_temp),
-            'area': float(area),
-        })
+            'mean_temp': float(sum_temp[i] / area[i]),
+            'area': float(area[i]),
+        }
+        if modules is not None:
+            hotspot['module'] = int(modules[i])
+            hotspot['delta_t'] = float(max_temp - mean_temp[modules[i]])
+        else:
+            hotspot['delta_t'] = float(max_temp - mean_temp)
+        hotspots.append(hotspot)
     
     return hotspots
 
@@ -673,7 +2221,7 @@ def create_visual_output(calibrated_image, hotspots, panel_mask):
     
     # Draw panel contour
     contours, _ = cv2.findContours(panel_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    cv2.drawContours(color_mapped, contours, 0, (255, 255, 255), 2)
+    cv2.drawContours(color_mapped, contours, -1, (255, 255, 255), 2)
     
     # Draw hotspots
     for hotspot in hotspots:
@@ -691,11 +2239,14 @@ def calculate_temperature_distribution(temperatures, min_temp, max_temp):
         'bin_edges': bin_edges.tolist()
     }
 
-def interpret_results(hotspots, mean_panel_temp, std_panel_temp):
+def interpret_results(hotspots, mean_panel_temp, std_panel_temp, module_stds=None):
     interpreted_results = []
     for hotspot in hotspots:
         delta_t = hotspot['delta_t']
         area = hotspot['area']
+        # Severity is judged against the owning module's spread when modules are known
+        if module_stds is not None and 'module' in hotspot:
+            std_panel_temp = module_stds[hotspot['module']]
         
         # Determine severity
         if delta_t > 3 * std_panel_temp:
@@ -733,6 +2284,8 @@ def interpret_results(hotspots, mean_panel_temp, std_panel_temp):
             'shape': shape,
             'fault_type': fault_type
         })
+        if 'module' in hotspot:
+            interpreted_results[-1]['module'] = hotspot['module']
     
     return interpreted_results
 
@@ -797,6 +2350,7 @@ def thermal_imaging_interpreter():
         return render_template('thermal_imaging_interpreter.html')
 
 @app.route('/analyze_thermal_image', methods=['POST'])
+@async_job('thermal_image')
 def analyze_thermal_image_route():
     if 'image' not in request.files:
         logger.error("No image provided in the request")
@@ -809,24 +2363,76 @@ def analyze_thermal_image_route():
         logger.debug(f"Received file: {file.filename}, Content-Type: {file.content_type}")
         logger.debug(f"Metadata: {metadata}")
         
-        file_bytes = file.read()
-        logger.debug(f"File size: {len(file_bytes)} bytes")
-        
-        nparr = np.frombuffer(file_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise ValueError("Failed to decode image")
+        # 'inline' embeds a base64 PNG, 'url' and 'none' leave the image to /api/thermal_render
+        image_mode = metadata.pop('image_mode', 'inline')
+        if image_mode not in ('inline', 'url', 'none'):
+            raise ValueError(f"Unknown image_mode '{image_mode}'")
         
-        logger.debug(f"Image shape: {image.shape}")
+        # Radiometric input: input_mode=radiometric, a .npy array, or a 16-bit single-channel TIFF/PNG
+        radiometric = is_radiometric_upload(file.filename, metadata)
+        file_bytes = None
+        if not radiometric:
+            file_bytes = file.read()
+            logger.debug(f"File size: {len(file_bytes)} bytes")
+            radiometric = is_radiometric_image(file_bytes)
+        if radiometric:
+            # Spool to disk so the frame is decoded from a file like survey frames
+            spool = tempfile.NamedTemporaryFile(suffix=os.path.splitext(file.filename or '')[1].lower(), delete=False)
+            if file_bytes is None:
+                file.save(spool)
+            else:
+                spool.write(file_bytes)
+            spool.close()
+            result_id = thermal_result_key(None, metadata, path=spool.name)
+        else:
+            result_id = thermal_result_key(file_bytes, metadata)
         
-        # Perform pre-analysis checks
-        checks = perform_pre_analysis_checks(image, metadata)
-        if checks:
-            logger.warning(f"Pre-analysis checks failed: {', '.join(checks)}")
-            return jsonify({'error': 'Pre-analysis checks failed', 'checks': checks}), 400
+        try:
+            results = thermal_result_cache.get(result_id)
+            # Results outlive their render inputs; when an image is wanted, a result whose inputs
+            # were evicted is a miss
+            if results is not None and image_mode != 'none' and thermal_render_inputs.get(result_id) is None:
+                results = None
+            if results is None:
+                if radiometric:
+                    temperatures = load_radiometric_image(spool.name, metadata)
+                    logger.debug(f"Radiometric frame shape: {temperatures.shape}")
+                    checks = perform_radiometric_checks(temperatures)
+                else:
+                    nparr = np.frombuffer(file_bytes, np.uint8)
+                    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                    
+                    if image is None:
+                        raise ValueError("Failed to decode image")
+                    
+                    logger.debug(f"Image shape: {image.shape}")
+                    
+                    # Perform pre-analysis checks
+                    checks = perform_pre_analysis_checks(image, metadata)
+                if checks:
+                    logger.warning(f"Pre-analysis checks failed: {', '.join(checks)}")
+                    return jsonify({'error': 'Pre-analysis checks failed', 'checks': checks}), 400
+                
+                render_inputs = {}
+                if radiometric:
+                    results = analyze_radiometric_image(temperatures, metadata, render=False, render_inputs=render_inputs)
+                else:
+                    results = analyze_thermal_image_with_fallbacks(image, metadata, render=False, render_inputs=render_inputs)
+                if 'error' not in results:
+                    thermal_result_cache.put(result_id, results)
+                    thermal_render_inputs.put(result_id, render_inputs)
+            else:
+                logger.debug(f"Serving cached analysis {result_id[:12]}")
+        finally:
+            if radiometric:
+                os.unlink(spool.name)
         
-        results = analyze_thermal_image_with_fallbacks(image, metadata)
+        results = dict(results, result_id=result_id)
+        if 'error' not in results and image_mode != 'none':
+            results['image_url'] = url_for('thermal_render', result_id=result_id)
+        if image_mode == 'inline' and 'error' not in results:
+            rendered = render_thermal_overlay(result_id)
+            results['processed_image'] = base64.b64encode(rendered[0]).decode('utf-8') if rendered else None
         return json.dumps(results, cls=NumpyEncoder), 200, {'Content-Type': 'application/json'}
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
@@ -840,6 +2446,88 @@ def analyze_thermal_image_route():
         logger.error(f"Detailed error info: {error_info}")
         return json.dumps(error_info, cls=NumpyEncoder), 500, {'Content-Type': 'application/json'}
     
+# Analysis results are cached under a hash of the image bytes and metadata. The overlay image
+# is rendered only when /api/thermal_render asks for it, and each encoding is cached separately.
+thermal_result_cache = LRUCache(maxsize=int(os.environ.get('THERMAL_RESULT_CACHE_SIZE', 256)),
+                                ttl=float(os.environ.get('THERMAL_RESULT_CACHE_TTL', 3600)))
+thermal_render_inputs = LRUCache(maxsize=int(os.environ.get('THERMAL_RENDER_INPUTS_SIZE', 32)),
+                                 ttl=float(os.environ.get('THERMAL_RESULT_CACHE_TTL', 3600)))
+thermal_render_cache = LRUCache(maxsize=int(os.environ.get('THERMAL_RENDER_CACHE_SIZE', 128)),
+                                ttl=float(os.environ.get('THERMAL_RESULT_CACHE_TTL', 3600)))
+
+# Encoder flags are named rather than resolved here so OpenCV stays unloaded until a render
+RENDER_FORMATS = {
+    'png': ('.png', 'image/png', ('IMWRITE_PNG_COMPRESSION', 3)),
+    'jpeg': ('.jpg', 'image/jpeg', ('IMWRITE_JPEG_QUALITY', 85)),
+    'webp': ('.webp', 'image/webp', ('IMWRITE_WEBP_QUALITY', 80)),
+}
+
+def thermal_result_key(file_bytes, metadata, path=None):
+    digest = hashlib.sha256()
+    if path is not None:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    else:
+        digest.update(file_bytes)
+    digest.update(json.dumps(metadata, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def render_thermal_overlay(result_id, fmt='png', max_size=0):
+    # Returns (encoded bytes, mimetype), or None once the analysis has been evicted
+    key = (result_id, fmt, max_size)
+    rendered = thermal_render_cache.get(key)
+    if rendered is not None:
+        return rendered
+    
+    inputs = thermal_render_inputs.get(result_id)
+    if inputs is None:
+        return None
+    if 'image' in inputs:
+        color_mapped = inputs['image']
+    else:
+        color_mapped = create_visual_output(inputs['calibrated'], inputs['hotspots'], inputs['panel_mask'])
+    
+    # Downscale for previews
+    if max_size and max(color_mapped.shape[:2]) > max_size:
+        scale = max_size / max(color_mapped.shape[:2])
+        color_mapped = cv2.resize(color_mapped, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    extension, mimetype, (flag, value) = RENDER_FORMATS[fmt]
+    ok, buffer = cv2.imencode(extension, color_mapped, [getattr(cv2, flag), value])
+    if not ok:
+        raise ValueError(f"Failed to encode overlay as {fmt}")
+    rendered = (buffer.tobytes(), mimetype)
+    thermal_render_cache.put(key, rendered)
+    return rendered
+
+@app.route('/api/thermal_render/<result_id>', methods=['GET'])
+def thermal_render(result_id):
+    fmt = request.args.get('format', 'png').lower()
+    fmt = 'jpeg' if fmt == 'jpg' else fmt
+    if fmt not in RENDER_FORMATS:
+        return jsonify({'error': f"Unsupported format '{fmt}'. Use one of: {', '.join(RENDER_FORMATS)}"}), 400
+    try:
+        max_size = int(request.args.get('max_size', 0))
+    except ValueError:
+        return jsonify({'error': 'max_size must be an integer'}), 400
+    
+    rendered = render_thermal_overlay(result_id, fmt, max(max_size, 0))
+    if rendered is None:
+        return jsonify({'error': 'Unknown or expired result'}), 404
+    data, mimetype = rendered
+    response = Response(data, mimetype=mimetype)
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+@app.route('/api/thermal_cache', methods=['GET'])
+def thermal_cache_status():
+    return jsonify({
+        'results': thermal_result_cache.stats(),
+        'render_inputs': thermal_render_inputs.stats(),
+        'renders': thermal_render_cache.stats()
+    })
+
 def fallback_panel_detection(image):
     # Simple fallback: assume the entire image is the panel
     return np.ones(image.shape[:2], dtype=np.uint8) * 255
@@ -850,9 +2538,9 @@ def fallback_hotspot_detection(calibrated_image):
     hotspots = np.where(calibrated_image > threshold)
     return [{'location': (x, y), 'max_temp': calibrated_image[y, x]} for y, x in zip(*hotspots)]
 
-def analyze_thermal_image_with_fallbacks(image, metadata):
+def analyze_thermal_image_with_fallbacks(image, metadata, render=True, render_inputs=None):
     try:
-        return analyze_thermal_image(image, metadata)
+        return analyze_thermal_image(image, metadata, render, render_inputs)
     except Exception as e:
         logger.error(f"Error in main analysis, attempting fallback: {str(e)}")
         
@@ -875,10 +2563,14 @@ def analyze_thermal_image_with_fallbacks(image, metadata):
         
         # Create a simple visual output
         color_mapped = cv2.applyColorMap(normalized, cv2.COLORMAP_JET)
+        if render_inputs is not None:
+            render_inputs.update(image=color_mapped)
         
         # Encode processed image
-        _, buffer = cv2.imencode('.png', color_mapped)
-        processed_image = base64.b64encode(buffer).decode('utf-8')
+        processed_image = None
+        if render:
+            _, buffer = cv2.imencode('.png', color_mapped)
+            processed_image = base64.b64encode(buffer).decode('utf-8')
         
         return {
             'hotspots': hotspots,
@@ -891,6 +2583,599 @@ def analyze_thermal_image_with_fallbacks(image, metadata):
         }
 
 
+# Batch thermal surveys: frames are spooled to disk and analyzed on a process pool
+THERMAL_POOL_WORKERS = int(os.environ.get('THERMAL_POOL_WORKERS', os.cpu_count() or 1))
+THERMAL_FRAME_TIMEOUT = float(os.environ.get('THERMAL_FRAME_TIMEOUT', 60))  # seconds per frame
+THERMAL_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp') + RADIOMETRIC_EXTENSIONS
+SURVEY_WORST_FRAMES = 10
+
+def read_frame_bytes(source):
+    # source is a file path, or (archive path, member name) for a frame inside a ZIP
+    if isinstance(source, tuple):
+        with zipfile.ZipFile(source[0]) as archive:
+            return archive.read(source[1])
+    with open(source, 'rb') as f:
+        return f.read()
+
+def analyze_thermal_frame(source, metadata, include_image=False):
+    # Runs in a worker process so only the path, not the image, crosses the process boundary
+    frame_bytes = None
+    radiometric = is_radiometric_upload(source[1] if isinstance(source, tuple) else source, metadata)
+    if not radiometric:
+        frame_bytes = read_frame_bytes(source)
+        radiometric = is_radiometric_image(frame_bytes)
+    if radiometric:
+        temperatures = load_radiometric_image(source, metadata)
+        checks = perform_radiometric_checks(temperatures)
+        if checks:
+            return {'error': 'Pre-analysis checks failed', 'checks': checks}
+        results = analyze_radiometric_image(temperatures, metadata, render=include_image)
+        if not include_image:
+            results.pop('processed_image', None)
+        return results
+    
+    image = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return {'error': 'Failed to decode image'}
+    
+    checks = perform_pre_analysis_checks(image, metadata)
+    if checks:
+        return {'error': 'Pre-analysis checks failed', 'checks': checks}
+    
+    # Frames are only drawn and encoded when the caller wants the overlay back
+    results = analyze_thermal_image_with_fallbacks(image, metadata, render=include_image)
+    if not include_image:
+        results.pop('processed_image', None)
+    return numpy_to_python(results)
+
+def spool_survey_frames(uploads, spool_dir):
+    # Save uploads to disk and list (frame name, source) for every image, including ZIP members
+    frames = []
+    for i, upload in enumerate(uploads):
+        name = upload.filename or f'upload_{i}'
+        path = os.path.join(spool_dir, f"{i:05d}_{secure_filename(name) or 'upload'}")
+        upload.save(path)
+        
+        if name.lower().endswith('.zip'):
+            with zipfile.ZipFile(path) as archive:
+                members = [m.filename for m in archive.infolist()
+                           if not m.is_dir() and m.filename.lower().endswith(THERMAL_IMAGE_EXTENSIONS)]
+            frames.extend((member, (path, member)) for member in sorted(members))
+        elif name.lower().endswith(THERMAL_IMAGE_EXTENSIONS):
+            frames.append((name, path))
+        else:
+            raise ValueError(f"Unsupported file in survey upload: {name}")
+    return frames
+
+def stream_thermal_survey(frames, metadata, include_images=False):
+    # Yield one NDJSON line per frame as it completes, then a survey-level summary line
+    summary = {
+        'frames': 0,
+        'frames_failed': 0,
+        'frames_with_hotspots': 0,
+        'hotspots_by_severity': {},
+    }
+    worst = []  # min-heap of (worst delta-T, frame, hotspot count)
+    
+    def finish(frame, result):
+        summary['frames'] += 1
+        if 'error' in result:
+            summary['frames_failed'] += 1
+        hotspots = result.get('hotspots') or []
+        if hotspots:
+            summary['frames_with_hotspots'] += 1
+            for hotspot in hotspots:
+                severity = hotspot.get('severity', 'Unclassified')
+                summary['hotspots_by_severity'][severity] = summary['hotspots_by_severity'].get(severity, 0) + 1
+            mean_temp = result.get('mean_temp') or 0
+            score = max(float(hotspot.get('delta_t', hotspot['max_temp'] - mean_temp)) for hotspot in hotspots)
+            entry = (score, frame, len(hotspots))
+            if len(worst) < SURVEY_WORST_FRAMES:
+                heapq.heappush(worst, entry)
+            else:
+                heapq.heappushpop(worst, entry)
+        return json.dumps({'frame': frame, 'result': result}, cls=NumpyEncoder) + '\n'
+    
+    pending = {}
+    try:
+        with PoolSession('thermal', THERMAL_POOL_WORKERS) as session:
+            for frame, source in frames:
+                if THERMAL_POOL_WORKERS <= 1:
+                    try:
+                        result = analyze_thermal_frame(source, metadata, include_images)
+                    except Exception as e:
+                        result = {'error': f"Failed to analyze frame: {str(e)}"}
+                    yield finish(frame, result)
+                    continue
+                
+                future = session.submit(analyze_thermal_frame, source, metadata, include_images)
+                pending[future] = (frame,)
+                while len(pending) >= 2 * THERMAL_POOL_WORKERS:
+                    yield from drain_futures(pending, finish, THERMAL_FRAME_TIMEOUT, session, 'frame')
+            
+            while pending:
+                yield from drain_futures(pending, finish, THERMAL_FRAME_TIMEOUT, session, 'frame')
+    except Exception as e:
+        logger.error(f"Error in thermal survey: {str(e)}")
+        logger.error(traceback.format_exc())
+        yield json.dumps({'error': str(e)}) + '\n'
+    
+    summary['worst_frames'] = [
+        {'frame': frame, 'max_delta_t': score, 'hotspot_count': count}
+        for score, frame, count in sorted(worst, reverse=True)
+    ]
+    yield json.dumps({'summary': summary}, cls=NumpyEncoder) + '\n'
+
+@app.route('/api/thermal_survey', methods=['POST'])
+def thermal_survey():
+    uploads = request.files.getlist('images') + request.files.getlist('archive')
+    if not uploads:
+        logger.error("No images provided in the survey request")
+        return jsonify({'error': 'No images provided'}), 400
+    
+    metadata = request.form.to_dict()
+    include_images = metadata.pop('include_images', 'false').lower() == 'true'
+    
+    spool_dir = tempfile.TemporaryDirectory(prefix='thermal_survey_')
+    try:
+        frames = spool_survey_frames(uploads, spool_dir.name)
+        if not frames:
+            raise ValueError("No image files found in the upload")
+    except (ValueError, zipfile.BadZipFile) as e:
+        spool_dir.cleanup()
+        logger.error(f"Invalid thermal survey upload: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    
+    def generate():
+        try:
+            yield from stream_thermal_survey(frames, metadata, include_images)
+        finally:
+            spool_dir.cleanup()
+    
+    logger.debug(f"Streaming thermal survey of {len(frames)} frames")
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Tiled analysis of large orthomosaics. The mosaic is read through a memory map and processed
+# in overlapping tiles; intermediate calibrated data lives in memory-mapped files on disk.
+MOSAIC_TILE_SIZE = int(os.environ.get('MOSAIC_TILE_SIZE', 1024))
+MOSAIC_TILE_OVERLAP = int(os.environ.get('MOSAIC_TILE_OVERLAP', 32))
+
+def open_mosaic(path):
+    # Mosaics are only ever read a window at a time: .npy and uncompressed TIFFs are memory-mapped,
+    # compressed or tiled TIFFs go through tifffile's zarr store. Other formats would have to be
+    # decoded whole, so they are refused.
+    lower = path.lower()
+    if lower.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if not lower.endswith(('.tif', '.tiff')):
+        raise ValueError("Mosaics must be uploaded as .npy or TIFF so they can be read in windows")
+    
+    try:
+        tifffile = importlib.import_module('tifffile')
+        with tifffile.TiffFile(path) as tif:
+            memmappable = tif.pages[0].is_memmappable
+        if memmappable:
+            return tifffile.memmap(path, mode='r')
+        zarr = importlib.import_module('zarr')
+        return zarr.open(tifffile.imread(path, aszarr=True), mode='r')
+    except ImportError:
+        raise ValueError("Compressed TIFF mosaics require tifffile and zarr on the server; "
+                         "upload an uncompressed TIFF or .npy instead")
+
+def iter_tiles(shape, tile_size, overlap=0):
+    # Yield (core slice, padded slice, core slice within the padded tile) in row-major order
+    height, width = shape[:2]
+    for y0 in range(0, height, tile_size):
+        y1 = min(y0 + tile_size, height)
+        py0, py1 = max(y0 - overlap, 0), min(y1 + overlap, height)
+        for x0 in range(0, width, tile_size):
+            x1 = min(x0 + tile_size, width)
+            px0, px1 = max(x0 - overlap, 0), min(x1 + overlap, width)
+            yield ((slice(y0, y1), slice(x0, x1)),
+                   (slice(py0, py1), slice(px0, px1)),
+                   (slice(y0 - py0, y1 - py0), slice(x0 - px0, x1 - px0)))
+
+def mosaic_tile_to_gray(tile, value_range):
+    # Bring one tile to 8-bit grayscale on the mosaic-wide value range
+    tile = np.asarray(tile)
+    if tile.ndim == 3:
+        tile = cv2.cvtColor(np.ascontiguousarray(tile[..., :3]), cv2.COLOR_BGR2GRAY)
+    if tile.dtype == np.uint8:
+        return tile
+    low, high = value_range
+    scaled = (tile.astype(np.float32) - low) * (255.0 / max(high - low, 1e-12))
+    return np.clip(scaled, 0, 255).astype(np.uint8)
+
+def mosaic_value_range(mosaic, tile_size):
+    # Read tile by tile like the analysis passes, so memory does not grow with mosaic width
+    if mosaic.dtype == np.uint8:
+        return 0.0, 255.0
+    low, high = np.inf, -np.inf
+    for (rows, cols), _, _ in iter_tiles(mosaic.shape, tile_size):
+        tile = np.asarray(mosaic[rows, cols])
+        low, high = min(low, float(np.min(tile))), max(high, float(np.max(tile)))
+    return low, high
+
+def mosaic_panel_threshold(mosaic, value_range, tile_size):
+    # One Otsu threshold from the mosaic-wide grayscale histogram, so every tile splits panel from
+    # background at the same level
+    hist = np.zeros(256, dtype=np.float64)
+    for (rows, cols), _, _ in iter_tiles(mosaic.shape, tile_size):
+        gray = mosaic_tile_to_gray(mosaic[rows, cols], value_range)
+        hist += np.bincount(gray.ravel(), minlength=256)
+    
+    levels = np.arange(256)
+    weight_low = np.cumsum(hist)
+    weight_high = weight_low[-1] - weight_low
+    sum_low = np.cumsum(hist * levels)
+    mean_low = sum_low / np.maximum(weight_low, 1)
+    mean_high = (sum_low[-1] - sum_low) / np.maximum(weight_high, 1)
+    return int(np.argmax(weight_low * weight_high * (mean_low - mean_high) ** 2))
+
+def detect_hotspots_tiled(calibrated, panel_mask, mean_temp, std_temp, tile_size, min_area=5, max_hotspots=None):
+    # Connected components over the whole mosaic, one tile at a time. Regions that touch a tile
+    # seam are merged with a union-find over the labels on either side of the seam.
+    threshold = mean_temp + 2 * std_temp
+    width = calibrated.shape[1]
+    
+    parent = [0]
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+    
+    stats = {'area': [np.zeros(1)], 'sum_x': [np.zeros(1)], 'sum_y': [np.zeros(1)],
+             'sum_temp': [np.zeros(1)], 'max_temp': [np.full(1, -np.inf)]}
+    bottom_labels = np.zeros(width, dtype=np.int64)
+    right_labels = None
+    
+    for (rows, cols), _, _ in iter_tiles(calibrated.shape, tile_size):
+        temps = np.asarray(calibrated[rows, cols])
+        anomaly_mask = (temps > threshold) & (np.asarray(panel_mask[rows, cols]) > 0)
+        labeled, num_features = ndimage.label(anomaly_mask)
+        
+        base = len(parent) - 1
+        parent.extend(range(base + 1, base + num_features + 1))
+        global_labels = np.where(labeled > 0, labeled + base, 0)
+        
+        if num_features:
+            pixels = np.flatnonzero(labeled)
+            labels = labeled.ravel()[pixels]
+            ys, xs = np.divmod(pixels, labeled.shape[1])
+            values = temps.ravel()[pixels].astype(np.float64)
+            stats['area'].append(np.bincount(labels, minlength=num_features + 1)[1:])
+            stats['sum_x'].append(np.bincount(labels, weights=xs + cols.start, minlength=num_features + 1)[1:])
+            stats['sum_y'].append(np.bincount(labels, weights=ys + rows.start, minlength=num_features + 1)[1:])
+            stats['sum_temp'].append(np.bincount(labels, weights=values, minlength=num_features + 1)[1:])
+            stats['max_temp'].append(np.asarray(ndimage.maximum(temps, labeled, np.arange(1, num_features + 1)),
+                                                dtype=np.float64))
+        
+        # Union with the tile above (same columns) and the tile to the left (same rows)
+        seams = [(bottom_labels[cols], global_labels[0, :])] if rows.start > 0 else []
+        if cols.start > 0:
+            seams.append((right_labels, global_labels[:, 0]))
+        for before, after in seams:
+            touching = (before > 0) & (after > 0)
+            for a, b in np.unique(np.column_stack((before[touching], after[touching])), axis=0):
+                root_a, root_b = find(int(a)), find(int(b))
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+        
+        bottom_labels[cols] = global_labels[-1, :]
+        right_labels = global_labels[:, -1]
+    
+    if len(parent) == 1:
+        return []
+    
+    # Fold every label into its root and aggregate
+    roots = np.array([find(i) for i in range(len(parent))])
+    merged = {key: np.concatenate(values) for key, values in stats.items()}
+    area = np.bincount(roots, weights=merged['area'], minlength=len(parent))
+    sum_x = np.bincount(roots, weights=merged['sum_x'], minlength=len(parent))
+    sum_y = np.bincount(roots, weights=merged['sum_y'], minlength=len(parent))
+    sum_temp = np.bincount(roots, weights=merged['sum_temp'], minlength=len(parent))
+    max_temps = np.full(len(parent), -np.inf)
+    np.maximum.at(max_temps, roots, merged['max_temp'])
+    
+    keep = np.flatnonzero(area >= min_area)
+    keep = keep[keep > 0]
+    max_hotspots = MAX_HOTSPOTS if max_hotspots is None else max_hotspots
+    if max_hotspots and keep.size > max_hotspots:
+        keep = np.sort(keep[np.argpartition(-max_temps[keep], max_hotspots - 1)[:max_hotspots]])
+    
+    return [{
+        'location': (int(sum_x[i] / area[i]), int(sum_y[i] / area[i])),
+        'max_temp': float(max_temps[i]),
+        'mean_temp': float(sum_temp[i] / area[i]),
+        'delta_t': float(max_temps[i] - mean_temp),
+        'area': float(area[i]),
+    } for i in keep]
+
+def analyze_thermal_mosaic(mosaic, metadata, work_dir, tile_size=None, overlap=None):
+    tile_size = tile_size or MOSAIC_TILE_SIZE
+    overlap = MOSAIC_TILE_OVERLAP if overlap is None else overlap
+    min_temp = float(metadata.get('min_temp', 20))
+    max_temp = float(metadata.get('max_temp', 100))
+    shape = mosaic.shape[:2]
+    logger.debug(f"Starting tiled mosaic analysis. Mosaic shape: {mosaic.shape}, tile size: {tile_size}")
+    
+    # Intensity mapping and the panel threshold are fixed once for the whole mosaic; per-tile
+    # equalization would give the same temperature a different value in every tile
+    value_range = mosaic_value_range(mosaic, tile_size)
+    panel_threshold = mosaic_panel_threshold(mosaic, value_range, tile_size)
+    calibrated = np.lib.format.open_memmap(os.path.join(work_dir, 'calibrated.npy'), mode='w+',
+                                           dtype=np.float32, shape=shape)
+    panel_mask = np.lib.format.open_memmap(os.path.join(work_dir, 'panel_mask.npy'), mode='w+',
+                                           dtype=np.uint8, shape=shape)
+    
+    # Pass 1: denoise and mask each padded tile, keeping only the tile core; every step is local, so
+    # the overlap makes the core identical to processing the mosaic whole. Panel statistics and the
+    # temperature histogram are accumulated as we go.
+    count, total, total_sq = 0, 0.0, 0.0
+    panel_min, panel_max = np.inf, -np.inf
+    hist = np.zeros(20, dtype=np.int64)
+    tiles = 0
+    for core, padded, inner in iter_tiles(shape, tile_size, overlap):
+        gray = mosaic_tile_to_gray(mosaic[padded], value_range)
+        denoised = cv2.bilateralFilter(gray, 9, 75, 75)
+        normalized = denoised.astype(np.float32) / 255
+        tile_mask = threshold_panel(denoised, panel_threshold)
+        
+        tile_temps = map_temperatures(normalized[inner], min_temp, max_temp)
+        tile_mask = tile_mask[inner]
+        calibrated[core] = np.where(tile_mask > 0, tile_temps, 0)
+        panel_mask[core] = tile_mask
+        
+        panel_temps = tile_temps[tile_mask > 0].astype(np.float64)
+        if panel_temps.size:
+            count += panel_temps.size
+            total += panel_temps.sum()
+            total_sq += np.square(panel_temps).sum()
+            panel_min, panel_max = min(panel_min, panel_temps.min()), max(panel_max, panel_temps.max())
+            hist += np.histogram(panel_temps, bins=20, range=(min_temp, max_temp))[0]
+        tiles += 1
+    
+    if count == 0:
+        raise ValueError("No panel area detected in mosaic")
+    mean_panel_temp = total / count
+    std_panel_temp = math.sqrt(max(total_sq / count - mean_panel_temp ** 2, 0))
+    logger.debug(f"Panel temperature statistics: mean={mean_panel_temp}, std={std_panel_temp}")
+    
+    # Pass 2: hotspots against the mosaic-wide threshold, merged across tile seams
+    max_hotspots = int(metadata.get('max_hotspots', MAX_HOTSPOTS))
+    hotspots = detect_hotspots_tiled(calibrated, panel_mask, mean_panel_temp, std_panel_temp, tile_size,
+                                     max_hotspots=max_hotspots)
+    
+    results = {
+        'hotspots': interpret_results(hotspots, mean_panel_temp, std_panel_temp),
+        'mean_temp': float(mean_panel_temp),
+        'max_temp': float(panel_max),
+        'min_temp': float(panel_min),
+        'processed_image': None,
+        'temp_distribution': {
+            'counts': hist.tolist(),
+            'bin_edges': np.linspace(min_temp, max_temp, 21).tolist()
+        },
+        'mosaic_shape': list(shape),
+        'tiles': tiles
+    }
+    return numpy_to_python(results)
+
+@app.route('/api/analyze_thermal_mosaic', methods=['POST'])
+def analyze_thermal_mosaic_route():
+    if 'image' not in request.files:
+        logger.error("No mosaic provided in the request")
+        return jsonify({'error': 'No image provided'}), 400
+    
+    file = request.files['image']
+    metadata = request.form.to_dict()
+    
+    try:
+        tile_size = int(metadata.get('tile_size', MOSAIC_TILE_SIZE))
+        overlap = int(metadata.get('overlap', MOSAIC_TILE_OVERLAP))
+        if tile_size < 64 or overlap < 0:
+            raise ValueError("tile_size must be at least 64 and overlap non-negative")
+        
+        with tempfile.TemporaryDirectory(prefix='thermal_mosaic_') as work_dir:
+            # Spool to disk so the mosaic is only ever read a window at a time
+            path = os.path.join(work_dir, secure_filename(file.filename or '') or 'mosaic')
+            file.save(path)
+            mosaic = open_mosaic(path)
+            results = analyze_thermal_mosaic(mosaic, metadata, work_dir, tile_size, overlap)
+            del mosaic
+        return json.dumps(results, cls=NumpyEncoder), 200, {'Content-Type': 'application/json'}
+    except ValueError as e:
+        logger.error(f"Invalid mosaic request: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error processing mosaic: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
+
+# Sequence sessions for video / drone passes: consecutive frames share a CLAHE instance, a
+# tracked panel mask, running panel statistics and stable hotspot IDs
+SESSION_REDETECT_THRESHOLD = 0.08  # mean absolute frame difference (0-1) that forces panel re-detection
+SESSION_MAX_MASK_REUSE = 30  # frames before the panel is re-detected regardless
+SESSION_TRACK_DISTANCE = 20  # pixels a hotspot may move between frames and keep its ID
+SESSION_TRACK_MAX_MISSES = 5  # frames a hotspot may go unseen before its ID is retired
+
+class ThermalSequenceSession:
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        self.previous_gray = None
+        self.panel_mask = None
+        self.mask_age = 0
+        self.frames = 0
+        self.redetections = 0
+        # Running panel statistics over the whole sequence (pairwise merge of per-frame moments)
+        self.pixel_count = 0
+        self.running_mean = 0.0
+        self.running_m2 = 0.0
+        # Hotspot tracks: id -> {'location': (x, y), 'misses': n}
+        self.tracks = {}
+        self.next_track_id = 1
+        self.lock = threading.Lock()
+    
+    def track_panel(self, gray):
+        # Reuse the previous mask, shifted by the estimated frame motion, while frames stay similar
+        if self.panel_mask is None or self.previous_gray is None or self.previous_gray.shape != gray.shape:
+            return None, (0.0, 0.0)
+        
+        small_prev = cv2.resize(self.previous_gray, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+        small_gray = cv2.resize(gray, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+        difference = float(np.mean(cv2.absdiff(small_prev, small_gray))) / 255
+        if difference > float(self.metadata.get('redetect_threshold', SESSION_REDETECT_THRESHOLD)):
+            return None, (0.0, 0.0)
+        if self.mask_age >= int(self.metadata.get('max_mask_reuse', SESSION_MAX_MASK_REUSE)):
+            return None, (0.0, 0.0)
+        
+        (dx, dy), _ = cv2.phaseCorrelate(np.float32(small_prev), np.float32(small_gray))
+        dx, dy = dx * 4, dy * 4
+        shift = np.float32([[1, 0, dx], [0, 1, dy]])
+        mask = cv2.warpAffine(self.panel_mask, shift, (gray.shape[1], gray.shape[0]), flags=cv2.INTER_NEAREST)
+        return mask, (dx, dy)
+    
+    def update_statistics(self, count, mean, std):
+        # Merge the frame's panel moments, already computed by the analysis, without revisiting pixels
+        if count == 0:
+            return
+        mean = float(mean)
+        m2 = float(std) ** 2 * count
+        total = self.pixel_count + count
+        delta = mean - self.running_mean
+        self.running_mean += delta * count / total
+        self.running_m2 += m2 + delta ** 2 * self.pixel_count * count / total
+        self.pixel_count = total
+    
+    def assign_hotspot_ids(self, hotspots, shift):
+        # Greedy nearest-neighbour matching against the motion-compensated previous positions
+        max_distance = float(self.metadata.get('track_distance', SESSION_TRACK_DISTANCE))
+        track_ids = list(self.tracks)
+        matched = {}
+        if track_ids and hotspots:
+            previous = np.array([self.tracks[t]['location'] for t in track_ids], dtype=float) + shift
+            current = np.array([h['location'] for h in hotspots], dtype=float)
+            distances = np.linalg.norm(current[:, np.newaxis, :] - previous[np.newaxis, :, :], axis=2)
+            used_tracks = set()
+            for flat in np.argsort(distances, axis=None):
+                i, j = divmod(int(flat), len(track_ids))
+                if distances[i, j] > max_distance:
+                    break
+                if i in matched or j in used_tracks:
+                    continue
+                matched[i] = track_ids[j]
+                used_tracks.add(j)
+        
+        seen = set()
+        for i, hotspot in enumerate(hotspots):
+            track_id = matched.get(i)
+            if track_id is None:
+                track_id = self.next_track_id
+                self.next_track_id += 1
+            hotspot['id'] = track_id
+            self.tracks[track_id] = {'location': tuple(hotspot['location']), 'misses': 0}
+            seen.add(track_id)
+        
+        for track_id in list(self.tracks):
+            if track_id not in seen:
+                self.tracks[track_id]['misses'] += 1
+                if self.tracks[track_id]['misses'] > SESSION_TRACK_MAX_MISSES:
+                    del self.tracks[track_id]
+    
+    def analyze_frame(self, image, render=False):
+        with self.lock:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+            panel_mask, shift = self.track_panel(gray)
+            redetected = panel_mask is None
+            
+            render_inputs = {}
+            results = analyze_thermal_image(gray, self.metadata, render=render, render_inputs=render_inputs,
+                                            clahe=self.clahe, panel_mask=panel_mask)
+            if 'error' in results:
+                return results
+            
+            self.panel_mask = render_inputs['panel_mask']
+            self.mask_age = 0 if redetected else self.mask_age + 1
+            self.redetections += int(redetected)
+            self.previous_gray = gray
+            self.frames += 1
+            
+            self.update_statistics(*render_inputs['panel_stats'])
+            self.assign_hotspot_ids(results['hotspots'], shift)
+            
+            results['frame_index'] = self.frames - 1
+            results['panel_redetected'] = redetected
+            results['sequence_stats'] = self.stats()
+            return results
+    
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'panel_redetections': self.redetections,
+            'mean_temp': self.running_mean if self.pixel_count else None,
+            'std_temp': math.sqrt(self.running_m2 / self.pixel_count) if self.pixel_count else None,
+            'active_hotspot_ids': sorted(self.tracks)
+        }
+
+thermal_sessions = LRUCache(maxsize=int(os.environ.get('THERMAL_SESSION_LIMIT', 64)),
+                            ttl=float(os.environ.get('THERMAL_SESSION_TTL', 1800)))
+
+@app.route('/api/thermal_session', methods=['POST'])
+def create_thermal_session():
+    metadata = request.form.to_dict() or (request.get_json(silent=True) or {})
+    if metadata.get('input_mode') == 'radiometric':
+        # Panel tracking works on the 8-bit view of each frame
+        return jsonify({'error': 'Radiometric input is not supported for sequence sessions; '
+                                 'use /analyze_thermal_image or /api/thermal_survey'}), 400
+    session_id = uuid.uuid4().hex
+    thermal_sessions.put(session_id, ThermalSequenceSession(metadata))
+    logger.debug(f"Created thermal sequence session {session_id}")
+    return jsonify({'session_id': session_id})
+
+@app.route('/api/thermal_session/<session_id>/frame', methods=['POST'])
+def analyze_thermal_session_frame(session_id):
+    session = thermal_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown or expired session'}), 404
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image provided'}), 400
+    if is_radiometric_upload(request.files['image'].filename, request.form):
+        return jsonify({'error': 'Radiometric input is not supported for sequence sessions; '
+                                 'use /analyze_thermal_image or /api/thermal_survey'}), 400
+    
+    try:
+        frame_bytes = request.files['image'].read()
+        if is_radiometric_image(frame_bytes):
+            return jsonify({'error': 'Radiometric input is not supported for sequence sessions; '
+                                     'use /analyze_thermal_image or /api/thermal_survey'}), 400
+        image = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Failed to decode image")
+        
+        # Sessions are refreshed on every frame so active streams do not expire
+        thermal_sessions.put(session_id, session)
+        results = session.analyze_frame(image, render=request.form.get('image_mode') == 'inline')
+        # A failed frame is not added to the session, which carries on with the next one
+        status = 500 if 'error' in results else 200
+        return json.dumps(results, cls=NumpyEncoder), status, {'Content-Type': 'application/json'}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error processing session frame: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/thermal_session/<session_id>', methods=['GET', 'DELETE'])
+def thermal_session_status(session_id):
+    session = thermal_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown or expired session'}), 404
+    if request.method == 'DELETE':
+        thermal_sessions.pop(session_id)
+    return jsonify(session.stats())
+
 #end of thermal imaging
 
 @app.route('/fault_diagnosis')
@@ -914,89 +3199,810 @@ def reliability_reporting():
 def generation_forecaster():
     return render_template('generation_forecaster.html')
 
-@app.route('/generate_forecast', methods=['POST'])
-def generate_forecast():
+# Ordinal encoding for Rainfall Category used as a model feature
+RAINFALL_ORDER = {
+    'Way Below Normal': 0,
+    'Below Normal': 1,
+    'Near Normal': 2,
+    'Above Normal': 3
+}
+
+FORECAST_FEATURES = ['Year', 'MonthNum', 'Rainfall Ordinal', 'Expected Generation']
+
+# Hyperparameters are part of the cache key, so changing them here retrains
+FORECAST_MODEL_PARAMS = {
+    'random_forest': {'n_estimators': 100, 'random_state': 42, 'oob_score': True},
+    'xgboost': {'n_estimators': 100, 'random_state': 42},
+    'arima': {'order': (1, 1, 1)}
+}
+
+# Trained forecast models shared by all requests in this worker, for at most
+# FORECAST_MODEL_CACHE_PLANTS plants (least recently used first out); every trained set is also
+# persisted under FORECAST_ARTIFACT_DIR so restarts and other workers load instead of retraining
+FORECAST_MODEL_CACHE_PLANTS = int(os.environ.get('FORECAST_MODEL_CACHE_PLANTS', 8))
+FORECAST_ARTIFACT_DIR = os.environ.get('FORECAST_ARTIFACT_DIR', os.path.join(app_dir, 'data', 'models'))
+forecast_model_cache = OrderedDict()
+forecast_model_cache_stats = {'hits': 0, 'misses': 0, 'builds': 0, 'disk_loads': 0, 'evictions': 0}
+# The cache lock only covers lookups and inserts; training, loading and updating a plant happen under
+# that plant's own lock, so one cold plant never holds up requests for the others
+forecast_model_cache_lock = threading.Lock()
+forecast_plant_locks = {}
+
+def forecast_plant_lock(path):
+    with forecast_model_cache_lock:
+        return forecast_plant_locks.setdefault(path, threading.RLock())
+
+# Plant registry: 'default' is the bundled history, any other plant is <plant_id>.csv in FORECAST_PLANTS_DIR
+DEFAULT_PLANT = 'default'
+FORECAST_PLANTS_DIR = os.environ.get('FORECAST_PLANTS_DIR', os.path.join(app_dir, 'data', 'plants'))
+PLANT_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+def list_plants():
+    plants = {DEFAULT_PLANT: csv_path}
+    if os.path.isdir(FORECAST_PLANTS_DIR):
+        for filename in sorted(os.listdir(FORECAST_PLANTS_DIR)):
+            plant_id, extension = os.path.splitext(filename)
+            if extension.lower() == '.csv' and PLANT_ID_PATTERN.match(plant_id):
+                plants[plant_id] = os.path.join(FORECAST_PLANTS_DIR, filename)
+    return plants
+
+def resolve_plant_dataset(plant_id=None):
+    if not plant_id or plant_id == DEFAULT_PLANT:
+        return csv_path
+    if not PLANT_ID_PATTERN.match(plant_id):
+        raise FileNotFoundError(f"Unknown plant '{plant_id}'")
+    path = os.path.join(FORECAST_PLANTS_DIR, f"{plant_id}.csv")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Unknown plant '{plant_id}'")
+    return path
+
+def forecast_artifact_dir(path):
+    plant_id = DEFAULT_PLANT if path == csv_path else os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(FORECAST_ARTIFACT_DIR, secure_filename(plant_id) or DEFAULT_PLANT)
+
+TRAINING_COLUMNS = ['Month'] + FORECAST_FEATURES + ['Actual Generation']
+
+def save_forecast_artifacts(path, entry):
+    # Native formats where there is one: joblib for the forest (memory-mappable arrays), XGBoost's
+    # UBJSON, statsmodels' pickle for ARIMA; the directory is swapped in whole
+    target = forecast_artifact_dir(path)
     try:
-        app.logger.info("Starting generate_forecast function")
+        os.makedirs(FORECAST_ARTIFACT_DIR, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=FORECAST_ARTIFACT_DIR, prefix='.staging-')
+    except OSError as e:
+        app.logger.warning(f"Could not persist forecast models for {os.path.basename(path)}: {str(e)}")
+        return
+    try:
+        models = entry['models']
+        joblib.dump(models['random_forest'], os.path.join(staging, 'random_forest.joblib'))
+        models['xgboost'].save_model(os.path.join(staging, 'xgboost.ubj'))
+        if models['arima'] is not None:
+            models['arima'].save(os.path.join(staging, 'arima.pickle'))
+        training = entry['df_train']
+        np.savez(os.path.join(staging, 'training.npz'),
+                 **{f'column_{i}': training[column].to_numpy() for i, column in enumerate(TRAINING_COLUMNS)})
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump({key: entry[key] for key in ('key', 'trained_at', 'full_trained_rows', 'rf_trained_rows',
+                                                   'incremental_updates')}, f)
         
-        # Load and preprocess the data
-        df = pd.read_csv(csv_path)
-        df['Month'] = pd.to_datetime(df['Month'], format='%B %Y')
-        df['Year'] = df['Month'].dt.year
-        df['MonthNum'] = df['Month'].dt.month
-        
-        # Handle missing values and convert to float
-        df['Expected Generation'] = df['Expected Generation'].str.replace(',', '').astype(float)
-        df['Actual Generation'] = df['Actual Generation'].str.replace(',', '').astype(float)
-        
-        # Remove rows where Actual Generation is NaN (future months)
-        df_train = df.dropna(subset=['Actual Generation'])
-        
-        # Create a custom ordinal encoding for Rainfall Category
-        rainfall_order = {
-            'Way Below Normal': 0,
-            'Below Normal': 1,
-            'Near Normal': 2,
-            'Above Normal': 3
-        }
-        df_train['Rainfall Ordinal'] = df_train['Rainfall Category'].map(rainfall_order)
+        retired = None
+        if os.path.exists(target):
+            retired = f"{target}.retired-{uuid.uuid4().hex}"
+            os.replace(target, retired)
+        os.replace(staging, target)
+        if retired:
+            shutil.rmtree(retired, ignore_errors=True)
+    except Exception as e:
+        app.logger.warning(f"Could not persist forecast models for {os.path.basename(path)}: {str(e)}")
+        shutil.rmtree(staging, ignore_errors=True)
+
+def load_forecast_artifacts(path, key=None):
+    # Persisted models for a plant, or None; with a key, only artifacts trained on that data version
+    directory = forecast_artifact_dir(path)
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if key is not None and meta['key'] != key:
+            return None
         
-        # Prepare features and target
-        X = df_train[['Year', 'MonthNum', 'Rainfall Ordinal', 'Expected Generation']]
-        y = df_train['Actual Generation']
+        rf_jobs, xgb_jobs = forecast_thread_budget()
+        rf_model = joblib.load(os.path.join(directory, 'random_forest.joblib'), mmap_mode='r')
+        rf_model.n_jobs = rf_jobs
+        xgb_model = XGBRegressor(n_jobs=xgb_jobs)
+        xgb_model.load_model(os.path.join(directory, 'xgboost.ubj'))
+        arima_path = os.path.join(directory, 'arima.pickle')
+        arima_results = None
+        if os.path.exists(arima_path):
+            with open(arima_path, 'rb') as f:
+                arima_results = pickle.load(f)
+        with np.load(os.path.join(directory, 'training.npz'), allow_pickle=False) as data:
+            df_train = pd.DataFrame({column: data[f'column_{i}'] for i, column in enumerate(TRAINING_COLUMNS)})
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        app.logger.warning(f"Ignoring unreadable forecast artifacts in {directory}: {str(e)}")
+        return None
+    
+    return {**meta, 'df_train': df_train,
+            'models': {'random_forest': rf_model, 'xgboost': xgb_model, 'arima': arima_results}}
+
+def cache_forecast_entry(path, entry):
+    # Caller holds forecast_model_cache_lock
+    forecast_model_cache[path] = entry
+    forecast_model_cache.move_to_end(path)
+    while len(forecast_model_cache) > FORECAST_MODEL_CACHE_PLANTS:
+        evicted, _ = forecast_model_cache.popitem(last=False)
+        forecast_model_cache_stats['evictions'] += 1
+        app.logger.info(f"Evicted forecast models for {os.path.basename(evicted)} from memory")
+
+# Parsed generation history: the CSV is parsed and validated once, then kept in memory and as a
+# typed NPZ snapshot next to the CSV, keyed by the CSV's mtime/size and content hash
+GENERATION_SNAPSHOT_VERSION = 1
+generation_datasets = {}
+generation_datasets_lock = threading.Lock()
+
+def generation_snapshot_path(path):
+    return f"{path}.snapshot.npz"
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def parse_generation_history(path):
+    df = pd.read_csv(path, dtype=str)
+    missing = [c for c in ('Month', 'Rainfall Category', 'Expected Generation', 'Actual Generation') if c not in df.columns]
+    if missing:
+        raise ValueError(f"Generation history is missing column(s): {', '.join(missing)}")
+    
+    month = pd.to_datetime(df['Month'], format='%B %Y')
+    if month.duplicated().any():
+        raise ValueError(f"Generation history has duplicate months: {', '.join(df['Month'][month.duplicated()])}")
+    unknown = set(df['Rainfall Category'].dropna()) - set(RAINFALL_ORDER)
+    if unknown:
+        raise ValueError(f"Unknown rainfall category: {', '.join(sorted(unknown))}")
+    
+    # Thousands separators are stripped once here instead of on every request
+    columns = {
+        'month': month.to_numpy(dtype='datetime64[ns]'),
+        'rainfall': df['Rainfall Category'].fillna('').to_numpy(dtype=str),
+        'expected': pd.to_numeric(df['Expected Generation'].str.replace(',', ''), errors='raise').to_numpy(dtype=np.float64),
+        'actual': pd.to_numeric(df['Actual Generation'].str.replace(',', ''), errors='raise').to_numpy(dtype=np.float64)
+    }
+    if np.any(columns['expected'] < 0) or np.any(columns['actual'] < 0):
+        raise ValueError("Generation values must not be negative")
+    return columns
+
+def write_generation_snapshot(path, columns, sha256, stat):
+    # Written atomically; a read-only data directory just means no snapshot
+    snapshot = generation_snapshot_path(path)
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(snapshot), suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, version=GENERATION_SNAPSHOT_VERSION, sha256=sha256,
+                     mtime_ns=stat.st_mtime_ns, size=stat.st_size, **columns)
+        os.replace(tmp_path, snapshot)
+    except OSError as e:
+        app.logger.warning(f"Could not write generation history snapshot {snapshot}: {str(e)}")
+
+def read_generation_snapshot(path, stat):
+    # Returns (sha256, columns, stat_matches) or None when there is no usable snapshot
+    snapshot = generation_snapshot_path(path)
+    if not os.path.exists(snapshot):
+        return None
+    try:
+        with np.load(snapshot, allow_pickle=False) as data:
+            if int(data['version']) != GENERATION_SNAPSHOT_VERSION:
+                return None
+            columns = {name: data[name] for name in ('month', 'rainfall', 'expected', 'actual')}
+            stat_matches = int(data['mtime_ns']) == stat.st_mtime_ns and int(data['size']) == stat.st_size
+            return str(data['sha256']), columns, stat_matches
+    except (OSError, ValueError, KeyError) as e:
+        app.logger.warning(f"Ignoring unreadable generation history snapshot {snapshot}: {str(e)}")
+        return None
+
+def build_generation_frame(columns):
+    df = pd.DataFrame({
+        'Month': columns['month'],
+        'Rainfall Category': pd.Series(columns['rainfall']).replace('', np.nan),
+        'Expected Generation': columns['expected'],
+        'Actual Generation': columns['actual']
+    })
+    df['Year'] = df['Month'].dt.year
+    df['MonthNum'] = df['Month'].dt.month
+    return df
+
+def get_generation_dataset(path=csv_path):
+    # Parsed history for a CSV: from memory, else from the snapshot, else parsed and snapshotted
+    stat = os.stat(path)
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    with generation_datasets_lock:
+        entry = generation_datasets.get(path)
+        if entry is not None and entry['stat'] == stat_key:
+            return entry
         
-        # Train Random Forest model
-        rf_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        rf_model.fit(X, y)
+        snapshot = read_generation_snapshot(path, stat)
+        if snapshot is not None and snapshot[2]:
+            sha256, columns = snapshot[0], snapshot[1]
+            source = 'snapshot'
+        else:
+            # mtime/size moved (or no snapshot): the content hash decides whether to re-parse
+            sha256 = file_sha256(path)
+            if entry is not None and entry['sha256'] == sha256:
+                entry['stat'] = stat_key
+                return entry
+            if snapshot is not None and snapshot[0] == sha256:
+                columns = snapshot[1]
+                source = 'snapshot'
+            else:
+                columns = parse_generation_history(path)
+                source = 'csv'
+            write_generation_snapshot(path, columns, sha256, stat)
         
-        # Train XGBoost model
-        xgb_model = XGBRegressor(n_estimators=100, random_state=42)
-        xgb_model.fit(X, y)
+        entry = {'stat': stat_key, 'sha256': sha256, 'frame': build_generation_frame(columns),
+                 'source': source, 'loaded_at': datetime.now().isoformat()}
+        generation_datasets[path] = entry
+        app.logger.info(f"Loaded generation history {os.path.basename(path)} from {source} ({len(entry['frame'])} rows)")
+        return entry
+
+def load_generation_history(path=csv_path, dataset=None):
+    # Requests get shallow copies: adding or replacing columns never touches the cached frame
+    dataset = dataset or get_generation_dataset(path)
+    df = dataset['frame'].copy(deep=False)
+    
+    # Remove rows where Actual Generation is NaN (future months)
+    df_train = df.dropna(subset=['Actual Generation']).copy()
+    df_train['Rainfall Ordinal'] = df_train['Rainfall Category'].map(RAINFALL_ORDER)
+    
+    return df, df_train
+
+def forecast_cache_key(dataset_sha256, params=FORECAST_MODEL_PARAMS):
+    # Content hash of the training data plus the model hyperparameters
+    digest = hashlib.sha256(dataset_sha256.encode('utf-8'))
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def build_expected_baseline(df, df_train):
+    # Mean Expected Generation per (calendar month, rainfall category): a 12 x 4 table indexed by
+    # month - 1 and rainfall ordinal, with empty cells falling back to the overall training mean
+    months = df['Month'].dt.month.to_numpy() - 1
+    ordinals = df['Rainfall Category'].map(RAINFALL_ORDER).to_numpy(dtype=np.float64)
+    expected = df['Expected Generation'].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(ordinals) & ~np.isnan(expected)
+    
+    cells = months[valid] * len(RAINFALL_ORDER) + ordinals[valid].astype(np.int64)
+    size = 12 * len(RAINFALL_ORDER)
+    sums = np.bincount(cells, weights=expected[valid], minlength=size)
+    counts = np.bincount(cells, minlength=size)
+    baseline = np.full(size, df_train['Expected Generation'].mean())
+    np.divide(sums, counts, out=baseline, where=counts > 0)
+    return baseline.reshape(12, len(RAINFALL_ORDER))
+
+def build_forecast_features(start_date, rainfall_categories, baseline):
+    # Feature matrix for consecutive months from start_date, built in one step
+    missing = [i for i, category in enumerate(rainfall_categories) if category is None]
+    if missing:
+        raise ValueError(f"Missing rainfall category for month {missing[0]}")
+    unknown = sorted(set(rainfall_categories) - set(RAINFALL_ORDER))
+    if unknown:
+        raise ValueError(f"Unknown rainfall category: {', '.join(unknown)}")
+    
+    month_index = start_date.year * 12 + start_date.month - 1 + np.arange(len(rainfall_categories))
+    years, months = month_index // 12, month_index % 12 + 1
+    ordinals = np.array([RAINFALL_ORDER[category] for category in rainfall_categories], dtype=np.int64)
+    
+    forecast_df = pd.DataFrame({
+        'Year': years,
+        'MonthNum': months,
+        'Rainfall Ordinal': ordinals,
+        'Expected Generation': baseline[months - 1, ordinals]
+    }, columns=FORECAST_FEATURES)
+    month_labels = [f"{calendar.month_name[m]} {y}" for y, m in zip(years.tolist(), months.tolist())]
+    return forecast_df, month_labels
+
+# The three models train concurrently, each in its own spawned process; each model's own threading is
+# sized so together they fit the machine, and a fit that overruns FORECAST_MODEL_TIMEOUT is terminated
+FORECAST_MODEL_TIMEOUT = float(os.environ.get('FORECAST_MODEL_TIMEOUT', 120))
+
+def forecast_thread_budget():
+    # ARIMA takes one core; the rest are split between the random forest and XGBoost
+    cores = max(1, (os.cpu_count() or 1) - 1)
+    rf_jobs = max(1, cores // 2)
+    return rf_jobs, max(1, cores - rf_jobs)
+
+def fit_random_forest(X, y, params):
+    rf_model = RandomForestRegressor(**params)
+    rf_model.fit(X, y)
+    return rf_model
+
+def fit_xgboost(X, y, params):
+    xgb_model = XGBRegressor(**params)
+    xgb_model.fit(X, y)
+    return xgb_model
+
+def fit_arima(y, params):
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore")
+        arima_model = ARIMA(y, order=params['order'])
+        return arima_model.fit()
+
+def run_forecast_fit(conn, fit, args):
+    # Child side of a training process: send back the fitted model, or the error
+    try:
+        conn.send(('ok', fit(*args)))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+def train_forecast_models(df_train, params=FORECAST_MODEL_PARAMS, timeout=None):
+    # Prepare features and target
+    X = df_train[FORECAST_FEATURES]
+    y = df_train['Actual Generation']
+    timeout = FORECAST_MODEL_TIMEOUT if timeout is None else timeout
+    
+    # Thread counts do not change the fitted models, so they stay out of params and the cache key
+    rf_jobs, xgb_jobs = forecast_thread_budget()
+    fits = {
+        'random_forest': (fit_random_forest, (X, y, {'n_jobs': rf_jobs, **params['random_forest']})),
+        'xgboost': (fit_xgboost, (X, y, {'n_jobs': xgb_jobs, **params['xgboost']})),
+        'arima': (fit_arima, (y, params['arima']))
+    }
+    
+    # A process rather than a thread per fit, so an overrunning fit can actually be stopped
+    context = multiprocessing.get_context('spawn')
+    started = time.monotonic()
+    running = {}
+    for name, (fit, args) in fits.items():
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=run_forecast_fit, args=(sender, fit, args), name=f'forecast-train-{name}',
+                                  daemon=True)
+        process.start()
+        sender.close()
+        running[name] = (process, receiver)
+    
+    models, errors = {}, {}
+    try:
+        for name, (process, receiver) in running.items():
+            if not receiver.poll(max(0, timeout - (time.monotonic() - started))):
+                errors[name] = f"timed out after {timeout:g} seconds"
+                continue
+            try:
+                status, value = receiver.recv()
+            except EOFError:
+                process.join()
+                status, value = 'error', f"training process exited with code {process.exitcode}"
+            if status == 'ok':
+                models[name] = value
+            else:
+                errors[name] = value
+    finally:
+        for process, receiver in running.values():
+            receiver.close()
+            if process.is_alive():
+                process.terminate()
+            process.join()
+    
+    for name in ('random_forest', 'xgboost'):
+        if name in errors:
+            raise RuntimeError(f"Training the {name} model failed: {errors[name]}")
+    if 'arima' in errors:
+        # The ensemble runs without ARIMA when it cannot be fitted
+        app.logger.error(f"ARIMA model fitting failed: {errors['arima']}")
+        models['arima'] = None
+    
+    app.logger.info(f"Trained forecast models in {time.monotonic() - started:.2f}s")
+    return models
+
+def cached_forecast_entry(path, key):
+    with forecast_model_cache_lock:
+        entry = forecast_model_cache.get(path)
+        if entry is not None and entry['key'] == key:
+            forecast_model_cache.move_to_end(path)
+            forecast_model_cache_stats['hits'] += 1
+            return entry
+        return None
+
+def get_forecast_models(path=csv_path, params=FORECAST_MODEL_PARAMS):
+    # Return the trained models for a dataset: from memory, else from disk, else trained and persisted
+    dataset = get_generation_dataset(path)
+    key = forecast_cache_key(dataset['sha256'], params)
+    entry = cached_forecast_entry(path, key)
+    if entry is not None:
+        return entry
+    
+    with forecast_plant_lock(path):
+        # Another request may have built this plant's models while we waited
+        entry = cached_forecast_entry(path, key)
+        if entry is not None:
+            return entry
         
-        # Train ARIMA model
+        with forecast_model_cache_lock:
+            forecast_model_cache_stats['misses'] += 1
+        df, df_train = load_generation_history(path, dataset)
+        entry = {
+            'key': key,
+            'params': params,
+            'df': df,
+            'df_train': df_train,
+            'baseline': build_expected_baseline(df, df_train)
+        }
+        stored = load_forecast_artifacts(path, key)
+        if stored is not None:
+            entry.update({name: stored[name] for name in ('models', 'trained_at', 'full_trained_rows',
+                                                          'rf_trained_rows', 'incremental_updates')})
+            source = 'disk_loads'
+        else:
+            app.logger.info(f"Training forecast models for {os.path.basename(path)} (key {key[:12]})")
+            entry.update({
+                'models': train_forecast_models(df_train, params),
+                'trained_at': datetime.now().isoformat(),
+                'full_trained_rows': len(df_train),
+                'rf_trained_rows': len(df_train),
+                'incremental_updates': 0
+            })
+            source = 'builds'
+            save_forecast_artifacts(path, entry)
+        with forecast_model_cache_lock:
+            forecast_model_cache_stats[source] += 1
+            cache_forecast_entry(path, entry)
+        return entry
+
+def get_forecast_model_cache_stats():
+    with forecast_model_cache_lock:
+        lookups = forecast_model_cache_stats['hits'] + forecast_model_cache_stats['misses']
+        return {
+            **forecast_model_cache_stats,
+            'hit_ratio': forecast_model_cache_stats['hits'] / lookups if lookups else None,
+            'max_plants': FORECAST_MODEL_CACHE_PLANTS,
+            'entries': [
+                {'dataset': os.path.basename(path), 'key': entry['key'], 'trained_at': entry['trained_at']}
+                for path, entry in forecast_model_cache.items()
+            ],
+            'datasets': [
+                {'dataset': os.path.basename(path), 'sha256': entry['sha256'], 'source': entry['source'],
+                 'rows': len(entry['frame']), 'loaded_at': entry['loaded_at']}
+                for path, entry in list(generation_datasets.items())
+            ]
+        }
+
+# Incremental updates from new monthly actuals: ARIMA state is extended without re-optimising,
+# XGBoost gets extra boosting rounds over a recent window, the random forest is refit on a
+# schedule, and anything that is not a clean append forces a full retrain
+FORECAST_XGB_UPDATE_ROUNDS = 10
+FORECAST_UPDATE_WINDOW = 24  # most recent months used for the extra boosting rounds
+FORECAST_RF_REFRESH_MONTHS = 3  # refit the random forest once this many months have accumulated
+FORECAST_FULL_RETRAIN_MONTHS = 12  # full retrain once this many months were added incrementally
+
+def format_generation_value(value):
+    return '' if pd.isna(value) else f"{value:,.0f}" if float(value).is_integer() else f"{value:,}"
+
+def write_generation_history(path, df):
+    # Same layout as the source CSV: '%B %Y' months, thousands separators, CRLF, no trailing newline
+    out = pd.DataFrame({
+        'Month': df['Month'].dt.strftime('%B %Y'),
+        'Rainfall Category': df['Rainfall Category'],
+        'Expected Generation': df['Expected Generation'].map(format_generation_value),
+        'Actual Generation': df['Actual Generation'].map(format_generation_value)
+    })
+    text = out.to_csv(index=False, lineterminator='\r\n').rstrip('\r\n')
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.csv')
+    with os.fdopen(fd, 'w', newline='') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def append_generation_actuals(path, actuals):
+    # Fill in (or add) months; new months need their expected generation and rainfall category.
+    # Everything is validated before the file is touched.
+    df = get_generation_dataset(path)['frame'].copy()
+    rows = {month: i for i, month in enumerate(df['Month'])}
+    
+    parsed = {}
+    for item in actuals:
+        month = pd.to_datetime(item['month'], format='%B %Y')
+        if month in parsed:
+            raise ValueError(f"Month {item['month']} appears more than once")
+        actual = float(str(item['actual_generation']).replace(',', ''))
+        if actual < 0:
+            raise ValueError("Generation values must not be negative")
+        if month not in rows:
+            if item.get('expected_generation') is None or item.get('rainfall_category') is None:
+                raise ValueError(f"New month {item['month']} needs expected_generation and rainfall_category")
+        if item.get('rainfall_category') is not None and item['rainfall_category'] not in RAINFALL_ORDER:
+            raise ValueError(f"Unknown rainfall category: {item['rainfall_category']}")
+        parsed[month] = (item, actual)
+    
+    # Actuals may correct months that already have one; anything else must continue the series
+    # straight after the last actual, up to the current month, so the history stays contiguous
+    current_month = pd.Timestamp.now().normalize().replace(day=1)
+    future = [month for month in parsed if month > current_month]
+    if future:
+        raise ValueError(f"Month {min(future).strftime('%B %Y')} is in the future")
+    has_actual = df['Actual Generation'].notna()
+    known = set(df.loc[has_actual, 'Month'])
+    new_months = sorted(month for month in parsed if month not in known)
+    if new_months:
+        last_actual = df.loc[has_actual, 'Month'].max()
+        start = new_months[0] if pd.isna(last_actual) else last_actual + pd.DateOffset(months=1)
+        expected_months = list(pd.date_range(start, periods=len(new_months), freq='MS'))
+        if new_months != expected_months:
+            after = '' if pd.isna(last_actual) else f" after {last_actual.strftime('%B %Y')}"
+            raise ValueError(f"New actuals must be consecutive months starting {expected_months[0].strftime('%B %Y')}"
+                             f"{after}; got {', '.join(month.strftime('%B %Y') for month in new_months)}")
+    
+    added = []
+    for month, (item, actual) in parsed.items():
+        if month in rows:
+            df.loc[rows[month], 'Actual Generation'] = actual
+            for field, column in (('expected_generation', 'Expected Generation'), ('rainfall_category', 'Rainfall Category')):
+                if item.get(field) is not None:
+                    df.loc[rows[month], column] = float(str(item[field]).replace(',', '')) if field == 'expected_generation' else item[field]
+        else:
+            df = pd.concat([df, pd.DataFrame({
+                'Month': [month],
+                'Rainfall Category': [item['rainfall_category']],
+                'Expected Generation': [float(str(item['expected_generation']).replace(',', ''))],
+                'Actual Generation': [actual]
+            })], ignore_index=True)
+            rows[month] = len(df) - 1
+        added.append(month.strftime('%B %Y'))
+    
+    write_generation_history(path, df.sort_values('Month', kind='stable'))
+    return added
+
+def plan_forecast_update(entry, df_train, force=False):
+    # 'none', 'incremental' or 'full', with the reason
+    old = entry['df_train']
+    if force:
+        return 'full', 'forced by request'
+    if entry['models']['arima'] is None:
+        return 'full', 'ARIMA model is missing'
+    if not hasattr(entry['models']['random_forest'], 'oob_prediction_'):
+        return 'full', 'random forest has no out-of-bag predictions'
+    
+    columns = FORECAST_FEATURES + ['Actual Generation']
+    known = df_train['Month'].isin(old['Month'])
+    previous = old.set_index('Month')[columns]
+    current = df_train[known].set_index('Month')[columns]
+    if len(current) != len(previous) or not previous.loc[current.index].equals(current):
+        return 'full', 'previously trained months changed'
+    
+    new_rows = df_train[~known]
+    if new_rows.empty:
+        return 'none', 'no new actuals'
+    # Only a contiguous run of months straight after the trained history can be appended
+    expected_months = pd.date_range(old['Month'].max(), periods=len(new_rows) + 1, freq='MS')[1:]
+    if not new_rows['Month'].reset_index(drop=True).equals(pd.Series(expected_months, name='Month')):
+        return 'full', 'new actuals are not contiguous with the trained history'
+    if len(df_train) - entry['full_trained_rows'] >= FORECAST_FULL_RETRAIN_MONTHS:
+        return 'full', f"{FORECAST_FULL_RETRAIN_MONTHS} months added since the last full retrain"
+    return 'incremental', f"{len(new_rows)} new month(s)"
+
+def update_forecast_models_incrementally(entry, df_train, params):
+    models = entry['models']
+    new_rows = df_train[~df_train['Month'].isin(entry['df_train']['Month'])]
+    rf_jobs, xgb_jobs = forecast_thread_budget()
+    
+    # ARIMA: extend the state with the new observations, keeping the fitted parameters
+    arima_results = models['arima'].append(new_rows['Actual Generation'].to_numpy(), refit=False)
+    
+    # XGBoost: a few more boosting rounds on the recent window, on top of the existing trees
+    window = df_train.iloc[-FORECAST_UPDATE_WINDOW:]
+    xgb_params = {'n_jobs': xgb_jobs, **params['xgboost'], 'n_estimators': FORECAST_XGB_UPDATE_ROUNDS}
+    xgb_model = XGBRegressor(**xgb_params)
+    xgb_model.fit(window[FORECAST_FEATURES], window['Actual Generation'], xgb_model=models['xgboost'].get_booster())
+    
+    # Random forest: refit on the full history only once enough months have accumulated
+    rf_model, rf_trained_rows = models['random_forest'], entry['rf_trained_rows']
+    if len(df_train) - rf_trained_rows >= FORECAST_RF_REFRESH_MONTHS:
+        rf_model = fit_random_forest(df_train[FORECAST_FEATURES], df_train['Actual Generation'],
+                                     {'n_jobs': rf_jobs, **params['random_forest']})
+        rf_trained_rows = len(df_train)
+    
+    return {'random_forest': rf_model, 'xgboost': xgb_model, 'arima': arima_results}, rf_trained_rows
+
+def update_forecast_models(path=csv_path, params=FORECAST_MODEL_PARAMS, force=False):
+    # Bring the cached models up to date with the dataset, incrementally where the policy allows
+    with forecast_plant_lock(path):
+        return update_forecast_models_locked(path, params, force)
+
+def update_forecast_models_locked(path, params, force):
+    dataset = get_generation_dataset(path)
+    key = forecast_cache_key(dataset['sha256'], params)
+    # Evicted plants pick up from their persisted models, whatever data version they were trained on
+    with forecast_model_cache_lock:
+        entry = forecast_model_cache.get(path)
+    if entry is None or entry['params'] != params:
+        entry = load_forecast_artifacts(path) if params == FORECAST_MODEL_PARAMS else None
+    if entry is None:
+        get_forecast_models(path, params)
+        return {'mode': 'full', 'reason': 'no trained models for this dataset'}
+    
+    df, df_train = load_generation_history(path, dataset)
+    mode, reason = plan_forecast_update(entry, df_train, force)
+    if mode == 'none':
+        # Nothing to train, but rows without actuals may have changed
+        entry = dict(entry, key=key, params=params, df=df, df_train=df_train,
+                     baseline=build_expected_baseline(df, df_train))
+        with forecast_model_cache_lock:
+            cache_forecast_entry(path, entry)
+        save_forecast_artifacts(path, entry)
+        return {'mode': mode, 'reason': reason}
+    
+    started = time.monotonic()
+    if mode == 'full':
+        models = train_forecast_models(df_train, params)
+        full_trained_rows = rf_trained_rows = len(df_train)
+        incremental_updates = 0
+    else:
         try:
-            with warnings.catch_warnings():
-                warnings.filterwarnings("ignore")
-                arima_model = ARIMA(y, order=(1, 1, 1))
-                arima_results = arima_model.fit()
+            models, rf_trained_rows = update_forecast_models_incrementally(entry, df_train, params)
         except Exception as e:
-            app.logger.error(f"ARIMA model fitting failed: {str(e)}")
-            arima_results = None
+            app.logger.error(f"Incremental forecast update failed, retraining: {str(e)}")
+            return update_forecast_models_locked(path, params, force=True)
+        full_trained_rows = entry['full_trained_rows']
+        incremental_updates = entry['incremental_updates'] + 1
+    
+    entry = {
+        'key': key,
+        'params': params,
+        'df': df,
+        'df_train': df_train,
+        'baseline': build_expected_baseline(df, df_train),
+        'models': models,
+        'trained_at': datetime.now().isoformat(),
+        'full_trained_rows': full_trained_rows,
+        'rf_trained_rows': rf_trained_rows,
+        'incremental_updates': incremental_updates
+    }
+    with forecast_model_cache_lock:
+        cache_forecast_entry(path, entry)
+    save_forecast_artifacts(path, entry)
+    app.logger.info(f"Forecast models updated ({mode}: {reason}) in {time.monotonic() - started:.2f}s")
+    return {'mode': mode, 'reason': reason, 'seconds': time.monotonic() - started}
+
+@app.route('/api/generation_actuals', methods=['POST'])
+def add_generation_actuals():
+    try:
+        data = request.get_json()
+        if not data or not data.get('actuals'):
+            return jsonify({'error': 'No actuals provided'}), 400
+        
+        path = resolve_plant_dataset(data.get('plant_id'))
+        # Held across the write and the update so no forecast of this plant retrains from the half-updated state
+        with forecast_plant_lock(path):
+            months = append_generation_actuals(path, data['actuals'])
+            update = update_forecast_models(path, force=bool(data.get('force_retrain')))
+        return jsonify({'months': months, 'update': update})
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f"Invalid input: {str(e)}"}), 400
+    except Exception as e:
+        app.logger.error(f"Error in add_generation_actuals: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/plants', methods=['GET'])
+def forecast_plants():
+    with forecast_model_cache_lock:
+        in_memory = set(forecast_model_cache)
+    return jsonify([{
+        'plant_id': plant_id,
+        'dataset': os.path.basename(path),
+        'in_memory': path in in_memory,
+        'persisted': os.path.exists(os.path.join(forecast_artifact_dir(path), 'meta.json'))
+    } for plant_id, path in list_plants().items()])
+
+@app.route('/api/forecast_model_cache', methods=['GET'])
+def forecast_model_cache_status():
+    return jsonify(get_forecast_model_cache_stats())
+
+# Prediction intervals from the trained models only: per-tree forest outputs, ARIMA's forecast
+# distribution, and the point ensemble plus a bootstrap of its out-of-sample residuals. The bands
+# are empirical quantiles, not calibrated probabilities
+FORECAST_INTERVAL_METHOD = ('empirical: the ensemble P10/P50/P90 are quantiles of the point ensemble plus resampled '
+                            'out-of-sample residuals (random forest out-of-bag and ARIMA one-step-ahead errors); '
+                            "random forest bands are tree quantiles and ARIMA bands its forecast distribution")
+FORECAST_QUANTILES = (10, 50, 90)
+FORECAST_BOOTSTRAP_SAMPLES = 2000
+
+def forest_tree_predictions(rf_model, X, leaf_values, leaf_offsets):
+    # Every tree's prediction from one apply() call: leaf ids index into the concatenated leaf values
+    leaves = rf_model.apply(X)
+    return leaf_values[leaf_offsets + leaves].T  # trees x samples
+
+def get_interval_state(entry):
+    # Built once per trained model set and kept on the cache entry
+    state = entry.get('interval_state')
+    if state is not None:
+        return state
+    
+    models, df_train = entry['models'], entry['df_train']
+    trees = models['random_forest'].estimators_
+    leaf_values = np.concatenate([tree.tree_.value[:, 0, 0] for tree in trees])
+    leaf_offsets = np.cumsum([0] + [tree.tree_.node_count for tree in trees[:-1]])
+    
+    # Out-of-sample residuals only: out-of-bag predictions for the months the forest was fitted on
+    # (later months it has never seen) and ARIMA's one-step-ahead predictions. XGBoost has no
+    # held-out predictions and nearly reproduces its training data, so it stays out of the residuals.
+    # ARIMA's first prediction has no history behind it
+    rf_model = models['random_forest']
+    X, y = df_train[FORECAST_FEATURES], df_train['Actual Generation'].to_numpy()
+    rf_fitted = forest_tree_predictions(rf_model, X, leaf_values, leaf_offsets).mean(axis=0)
+    oob = getattr(rf_model, 'oob_prediction_', None)
+    if oob is not None:
+        rf_fitted[:len(oob)] = oob
+    fitted = [rf_fitted]
+    if models['arima'] is not None:
+        fitted.append(np.asarray(models['arima'].fittedvalues))
+    residuals = (y - np.mean(fitted, axis=0))[1:]
+    
+    state = {'leaf_values': leaf_values, 'leaf_offsets': leaf_offsets, 'residuals': residuals}
+    entry['interval_state'] = state
+    return state
+
+def quantile_bands(samples, axis=0):
+    bands = np.percentile(samples, FORECAST_QUANTILES, axis=axis)
+    return [{f'p{q}': int(band[i]) for q, band in zip(FORECAST_QUANTILES, bands)} for i in range(bands.shape[1])]
+
+def forecast_intervals(entry, forecast_df, xgb_predictions, arima_forecast):
+    state = get_interval_state(entry)
+    tree_predictions = forest_tree_predictions(entry['models']['random_forest'], forecast_df,
+                                               state['leaf_values'], state['leaf_offsets'])
+    intervals = {'random_forest': quantile_bands(tree_predictions)}
+    
+    horizon = forecast_df.shape[0]
+    if arima_forecast is not None:
+        mean = np.asarray(arima_forecast.predicted_mean)
+        lower, upper = np.asarray(arima_forecast.conf_int(alpha=0.2)).T
+        intervals['arima'] = [{'p10': int(lo), 'p50': int(mid), 'p90': int(hi)} for lo, mid, hi in zip(lower, mean, upper)]
+        ensemble = np.mean([tree_predictions.mean(axis=0), xgb_predictions, mean], axis=0)
+    else:
+        intervals['arima'] = [None] * horizon
+        ensemble = np.mean([tree_predictions.mean(axis=0), xgb_predictions], axis=0)
+    
+    # The residuals already carry the members' forecast error, so they are resampled around the
+    # point ensemble rather than on top of the tree and ARIMA spread
+    ensemble_draws = np.broadcast_to(ensemble, (FORECAST_BOOTSTRAP_SAMPLES, horizon))
+    if state['residuals'].size:
+        rng = np.random.default_rng(int(entry['key'][:8], 16))
+        ensemble_draws = ensemble_draws + rng.choice(state['residuals'], size=(FORECAST_BOOTSTRAP_SAMPLES, horizon))
+    intervals['ensemble'] = quantile_bands(ensemble_draws)
+    return intervals
+
+@app.route('/generate_forecast', methods=['POST'])
+@async_job('forecast')
+def generate_forecast():
+    try:
+        app.logger.info("Starting generate_forecast function")
+        
+        # Reuse trained models unless the plant's dataset has changed
+        cached = get_forecast_models(resolve_plant_dataset(request.form.get('plant_id')))
+        df = cached['df']
+        df_train = cached['df_train']
+        rf_model = cached['models']['random_forest']
+        xgb_model = cached['models']['xgboost']
+        arima_results = cached['models']['arima']
         
         # Get user inputs
         start_date = pd.to_datetime(request.form['startDate'])
         forecast_months = int(request.form['forecastMonths'])
         
         # Prepare forecast data
-        forecast_data = []
-        for i in range(forecast_months):
-            forecast_date = start_date + pd.DateOffset(months=i)
-            rainfall_category = request.form.get(f'rainfall-{i}')
-            if rainfall_category is None:
-                raise ValueError(f"Missing rainfall category for month {i}")
-            
-            historical_month = df[(df['Month'].dt.month == forecast_date.month) & (df['Rainfall Category'] == rainfall_category)]
-            if historical_month.empty:
-                expected_generation = df_train['Expected Generation'].mean()
-            else:
-                expected_generation = historical_month['Expected Generation'].mean()
-            
-            forecast_data.append({
-                'Year': forecast_date.year,
-                'MonthNum': forecast_date.month,
-                'Rainfall Ordinal': rainfall_order[rainfall_category],
-                'Expected Generation': expected_generation
-            })
-        
-        forecast_df = pd.DataFrame(forecast_data)
+        rainfall_categories = [request.form.get(f'rainfall-{i}') for i in range(forecast_months)]
+        forecast_df, month_labels = build_forecast_features(start_date, rainfall_categories, cached['baseline'])
         
         # Generate predictions
         rf_predictions = rf_model.predict(forecast_df)
         xgb_predictions = xgb_model.predict(forecast_df)
         
+        arima_forecast = None
         if arima_results is not None:
-            arima_predictions = arima_results.forecast(steps=forecast_months)
-            arima_predictions = arima_predictions.tolist() if hasattr(arima_predictions, 'tolist') else list(arima_predictions)
+            arima_forecast = arima_results.get_forecast(steps=forecast_months)
+            arima_predictions = np.asarray(arima_forecast.predicted_mean).tolist()
         else:
             arima_predictions = [np.nan] * forecast_months
         
@@ -1008,20 +4014,23 @@ def generate_forecast():
         xgb_importances = xgb_model.feature_importances_
         
         feature_importances = {
-            'Random Forest': dict(zip(['Year', 'MonthNum', 'Rainfall Ordinal', 'Expected Generation'], rf_importances)),
-            'XGBoost': dict(zip(['Year', 'MonthNum', 'Rainfall Ordinal', 'Expected Generation'], xgb_importances))
+            'Random Forest': dict(zip(FORECAST_FEATURES, rf_importances)),
+            'XGBoost': dict(zip(FORECAST_FEATURES, xgb_importances))
         }
         
+        # P10/P50/P90 bands, without refitting anything
+        intervals = forecast_intervals(cached, forecast_df, xgb_predictions, arima_forecast)
+        
         # Prepare results
         forecast_results = []
         for i in range(forecast_months):
-            forecast_date = start_date + pd.DateOffset(months=i)
             forecast_results.append({
-                'month': forecast_date.strftime('%B %Y'),
+                'month': month_labels[i],
                 'random_forest': int(rf_predictions[i]),
                 'xgboost': int(xgb_predictions[i]),
                 'arima': int(arima_predictions[i]) if not np.isnan(arima_predictions[i]) else None,
-                'ensemble': int(ensemble_predictions[i])
+                'ensemble': int(ensemble_predictions[i]),
+                'intervals': {model: bands[i] for model, bands in intervals.items()}
             })
         
         # Generate insights
@@ -1030,7 +4039,8 @@ def generate_forecast():
         response_data = {
             'forecast': forecast_results,
             'insights': insights,
-            'feature_importances': feature_importances
+            'feature_importances': feature_importances,
+            'interval_method': FORECAST_INTERVAL_METHOD
         }
 
         # Convert the entire response data to ensure all NumPy types are handled
@@ -1038,6 +4048,8 @@ def generate_forecast():
 
         return jsonify(response_data)
     
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         app.logger.error(f"Error in generate_forecast: {str(e)}")
         app.logger.error(traceback.format_exc())
@@ -1073,6 +4085,16 @@ def generate_multi_model_insights(forecast_results, historical_data, feature_imp
     ensemble_avg = model_avgs['Ensemble']
     insights.append(f"The ensemble average predicted generation for the forecast period is {int(ensemble_avg):,} kWh.")
     
+    # Uncertainty, from the ensemble P10/P90 band
+    bands = [result['intervals']['ensemble'] for result in forecast_results if 'intervals' in result]
+    if bands:
+        band_width = np.mean([band['p90'] - band['p10'] for band in bands])
+        insights.append(f"The empirical ensemble P10-P90 band averages {int(band_width):,} kWh "
+                        f"({band_width / max(ensemble_avg, 1):.1%} of the average prediction).")
+        low_months = sum(band['p10'] < historical_avg for band in bands)
+        if low_months:
+            insights.append(f"In {low_months} of {len(bands)} forecast month(s) the P10 falls below the historical average.")
+    
     # Add insights about feature importances
     for model in ['Random Forest', 'XGBoost']:
         rainfall_importance = feature_importances[model]['Rainfall Ordinal']
@@ -1080,5 +4102,28 @@ def generate_multi_model_insights(forecast_results, historical_data, feature_imp
     
     return insights
 
+# Startup timing breakdown; lazily imported dependencies report when first loaded
+startup_timings = {
+    'core_imports_seconds': core_imports_finished - startup_started,
+    'module_body_seconds': time.perf_counter() - core_imports_finished,
+}
+if os.environ.get('PRELOAD_DEPENDENCIES') == '1':
+    preload_started = time.perf_counter()
+    preload_dependencies()
+    get_irradiance_index()
+    startup_timings['dependency_preload_seconds'] = time.perf_counter() - preload_started
+startup_timings['total_seconds'] = time.perf_counter() - startup_started
+
+@app.route('/api/startup_timings', methods=['GET'])
+def get_startup_timings():
+    return jsonify({
+        'startup': startup_timings,
+        'lazy_imports': {lazy._qualified_name: lazy_import_timings.get(lazy._qualified_name) for lazy in lazy_imports},
+        'loaded': [lazy._qualified_name for lazy in lazy_imports if lazy._qualified_name in lazy_import_timings]
+    })
+
 if __name__ == '__main__':
+    # Optionally train the forecast models before serving the first request
+    if os.environ.get('PRELOAD_FORECAST_MODELS') == '1':
+        get_forecast_models(csv_path)
     app.run(debug=True)
@@ -95,6 +95,8 @@ document.addEventListener('DOMContentLoaded', function() {
         formData.append('image', file);
         formData.append('min_temp', document.getElementById('minTemp').value);
         formData.append('max_temp', document.getElementById('maxTemp').value);
+        // Fetch the overlay separately so the JSON stays small and repeat uploads hit the cache
+        formData.append('image_mode', 'url');
     
         try {
             const response = await fetch('/analyze_thermal_image', {
@@ -155,7 +157,9 @@ document.addEventListener('DOMContentLoaded', function() {
         const originalImage = document.getElementById('originalImage');
         const processedImage = document.getElementById('processedImage');
         if (originalImage) originalImage.src = data.originalImageUrl || '';
-        if (processedImage && data.processed_image) {
+        if (processedImage && data.image_url) {
+            processedImage.src = data.image_url;
+        } else if (processedImage && data.processed_image) {
             processedImage.src = `data:image/png;base64,${data.processed_image}`;
         } else if (processedImage) {
             processedImage.src = ''; // Clear the image if no processed image is available
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+
+@pytest.fixture
+def plant_history(tmp_path, monkeypatch):
+    # Copy of the bundled history as a plant dataset, with the last `drop_months` months removed;
+    # models are persisted under tmp_path
+    monkeypatch.setattr(app, 'FORECAST_ARTIFACT_DIR', str(tmp_path / 'models'))
+    monkeypatch.setattr(app, 'FORECAST_PLANTS_DIR', str(tmp_path / 'plants'))
+    os.makedirs(tmp_path / 'plants')
+    
+    def make(plant_id='test_plant', drop_months=0):
+        with open(app.csv_path, 'rb') as f:
+            lines = f.read().split(b'\r\n')
+        path = str(tmp_path / 'plants' / f'{plant_id}.csv')
+        with open(path, 'wb') as f:
+            f.write(b'\r\n'.join(lines[:len(lines) - drop_months]))
+        return path
+    
+    yield make
+    with app.forecast_model_cache_lock:
+        for path in [path for path in app.forecast_model_cache if path.startswith(str(tmp_path))]:
+            del app.forecast_model_cache[path]
@@ -0,0 +1,59 @@
+import shutil
+import threading
+
+import numpy as np
+
+import app
+
+
+def copy_artifacts(source_path, target_path):
+    # Same history, so the persisted models are valid for the other plant too
+    shutil.copytree(app.forecast_artifact_dir(source_path), app.forecast_artifact_dir(target_path))
+
+
+def test_evicted_plant_reloads_persisted_models(plant_history, monkeypatch):
+    monkeypatch.setattr(app, 'FORECAST_MODEL_CACHE_PLANTS', 1)
+    first, second = plant_history('plant_a'), plant_history('plant_b')
+    stats = dict(app.forecast_model_cache_stats)
+    
+    trained = app.get_forecast_models(first)
+    X = trained['df_train'][app.FORECAST_FEATURES]
+    expected = {name: trained['models'][name].predict(X) for name in ('random_forest', 'xgboost')}
+    copy_artifacts(first, second)
+    
+    assert app.get_forecast_models(second)['key'] == trained['key']
+    assert first not in app.forecast_model_cache and second in app.forecast_model_cache
+    reloaded = app.get_forecast_models(first)
+    
+    assert reloaded is not trained
+    for name, predictions in expected.items():
+        np.testing.assert_allclose(reloaded['models'][name].predict(X), predictions)
+    np.testing.assert_allclose(reloaded['models']['arima'].forecast(3), trained['models']['arima'].forecast(3))
+    delta = {name: app.forecast_model_cache_stats[name] - stats[name] for name in stats}
+    assert delta == {'hits': 0, 'misses': 3, 'builds': 1, 'disk_loads': 2, 'evictions': 2}
+
+
+def test_busy_plant_does_not_block_other_plants(plant_history):
+    busy, warm = plant_history('busy_plant'), plant_history('warm_plant')
+    app.get_forecast_models(warm)
+    
+    # Stand in for a long cold build of another plant
+    held, release = threading.Event(), threading.Event()
+    def hold_busy_plant():
+        with app.forecast_plant_lock(busy):
+            held.set()
+            release.wait(30)
+    holder = threading.Thread(target=hold_busy_plant)
+    holder.start()
+    held.wait(5)
+    
+    try:
+        result = {}
+        reader = threading.Thread(target=lambda: result.update(entry=app.get_forecast_models(warm)))
+        reader.start()
+        reader.join(5)
+        assert not reader.is_alive()
+        assert result['entry'] is app.forecast_model_cache[warm]
+    finally:
+        release.set()
+        holder.join()
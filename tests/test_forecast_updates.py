@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+
+def actual(month, value, expected=None, rainfall=None):
+    item = {'month': month, 'actual_generation': value}
+    if expected is not None:
+        item.update(expected_generation=expected, rainfall_category=rainfall)
+    return item
+
+
+def test_incremental_update_matches_fixed_parameter_refit(plant_history):
+    path = plant_history(drop_months=2)
+    before = app.get_forecast_models(path)
+    full = app.load_generation_history(app.csv_path)[1]
+    
+    appended = full.iloc[-2:]
+    app.append_generation_actuals(path, [
+        actual(month.strftime('%B %Y'), value, expected, rainfall)
+        for month, value, expected, rainfall in zip(appended['Month'], appended['Actual Generation'],
+                                                    appended['Expected Generation'], appended['Rainfall Category'])
+    ])
+    update = app.update_forecast_models(path)
+    after = app.get_forecast_models(path)
+    
+    assert update['mode'] == 'incremental'
+    assert len(after['df_train']) == len(full)
+    # ARIMA keeps its parameters: identical to filtering the full series with them
+    arima = before['models']['arima']
+    filtered = app.ARIMA(full['Actual Generation'].to_numpy(), order=app.FORECAST_MODEL_PARAMS['arima']['order']).filter(arima.params)
+    np.testing.assert_allclose(after['models']['arima'].forecast(6), filtered.forecast(6), rtol=1e-8)
+    # The forest waits for FORECAST_RF_REFRESH_MONTHS; XGBoost gains the extra rounds
+    assert after['models']['random_forest'] is before['models']['random_forest']
+    assert (after['models']['xgboost'].get_booster().num_boosted_rounds()
+            == before['models']['xgboost'].get_booster().num_boosted_rounds() + app.FORECAST_XGB_UPDATE_ROUNDS)
+    
+    # Forecasts stay close to a full refit on the same data
+    refit = app.train_forecast_models(after['df_train'])
+    forecast_df, _ = app.build_forecast_features(pd.Timestamp('2024-08-01'), ['Near Normal'] * 6, after['baseline'])
+    def ensemble(models):
+        return np.nanmean([models['random_forest'].predict(forecast_df), models['xgboost'].predict(forecast_df),
+                           models['arima'].forecast(6)], axis=0)
+    np.testing.assert_allclose(ensemble(after['models']), ensemble(refit), rtol=0.15)
+
+
+@pytest.mark.parametrize('actuals, message', [
+    ([actual('September 2024', 1, 5, 'Near Normal')], 'consecutive'),
+    ([actual('August 2024', 1, 5, 'Near Normal'), actual('August 2024', 2)], 'more than once'),
+    ([actual('January 2030', 1, 5, 'Near Normal')], 'future'),
+])
+def test_append_rejects_gaps_duplicates_and_future_months(plant_history, actuals, message):
+    path = plant_history()
+    with open(path, 'rb') as f:
+        original = f.read()
+    
+    with pytest.raises(ValueError, match=message):
+        app.append_generation_actuals(path, actuals)
+    with open(path, 'rb') as f:
+        assert f.read() == original
+
+
+def test_append_accepts_corrections_and_the_next_month(plant_history):
+    path = plant_history()
+    months = app.append_generation_actuals(path, [actual('July 2024', '6,600,000'),
+                                                  actual('August 2024', 7000000, 6500000, 'Near Normal')])
+    
+    assert months == ['July 2024', 'August 2024']
+    frame = app.get_generation_dataset(path)['frame']
+    assert frame['Actual Generation'].iloc[-2:].tolist() == [6600000, 7000000]
+
+
+def synthetic_history(months, seed):
+    # A stationary plant: seasonal expected generation, a rainfall effect and noise, no trend
+    rng = np.random.default_rng(seed)
+    categories = list(app.RAINFALL_ORDER)
+    dates = pd.date_range('2010-01-01', periods=months, freq='MS')
+    ordinals = rng.integers(0, len(categories), months)
+    expected = 6.5e6 + 1e6 * np.sin(2 * np.pi * dates.month / 12) - 3e5 * (ordinals - 2) + rng.normal(0, 2e5, months)
+    generated = 0.85 * expected + rng.normal(0, 4e5, months)
+    rows = ['Month,Rainfall Category,Expected Generation,Actual Generation']
+    rows += [f'{date:%B %Y},{categories[ordinal]},"{int(e):,}","{int(a):,}"'
+             for date, ordinal, e, a in zip(dates, ordinals, expected, generated)]
+    return rows
+
+
+def test_ensemble_band_covers_held_out_months(plant_history, tmp_path):
+    plant_history()  # artifacts and plants under tmp_path
+    rows, held_out = synthetic_history(144, seed=1), 48
+    full_path, path = tmp_path / 'plants' / 'full.csv', tmp_path / 'plants' / 'synthetic.csv'
+    full_path.write_bytes('\r\n'.join(rows).encode())
+    path.write_bytes('\r\n'.join(rows[:-held_out]).encode())
+    
+    entry = app.get_forecast_models(str(path))
+    tail = app.load_generation_history(str(full_path))[1].iloc[-held_out:]
+    features, models = tail[app.FORECAST_FEATURES], entry['models']
+    bands = app.forecast_intervals(entry, features, models['xgboost'].predict(features),
+                                   models['arima'].get_forecast(steps=held_out))['ensemble']
+    
+    coverage = np.mean([band['p10'] <= value <= band['p90'] for band, value in zip(bands, tail['Actual Generation'])])
+    assert 0.65 <= coverage <= 0.92  # nominally 0.8
@@ -0,0 +1,52 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+import app
+
+
+def bulk_curves():
+    vth = app.thermal_voltage(45)
+    voltage = np.linspace(0, 38, 50)
+    return {f'string-{k}': (voltage, app.single_diode_current_lambertw(voltage, 8.5 + 0.25 * k, 5e-10, 0.3, 300, 66 * vth))
+            for k in range(4)}
+
+
+def post_bulk(client, payload, filename):
+    response = client.post('/api/analyze_iv_curves_bulk', data={
+        'irradiance': '900', 'temperature': '45', 'file': (io.BytesIO(payload), filename)})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_bulk_csv_streams_one_ndjson_line_per_curve(monkeypatch):
+    # Small chunks so curves straddle chunk boundaries; in-process so the test does not spawn workers
+    monkeypatch.setattr(app, 'IV_BULK_CHUNK_ROWS', 7)
+    monkeypatch.setattr(app, 'IV_POOL_WORKERS', 1)
+    app.iv_result_cache.clear()
+    curves = bulk_curves()
+    rows = ['curve_id,voltage,current'] + [f'{curve_id},{float(v)!r},{float(i)!r}' for curve_id, (voltage, current) in curves.items()
+                                           for v, i in zip(voltage, current)]
+    payload = '\n'.join(rows).encode()
+    client = app.app.test_client()
+    
+    lines = post_bulk(client, payload, 'curves.csv')
+    assert [line['curve_id'] for line in lines] == list(curves)
+    options = app.parse_curve_options({})
+    for line, (voltage, current) in zip(lines, curves.values()):
+        direct = app.analyze_single_curve(app.build_bulk_curve(np.column_stack((voltage, current))), 900, 45,
+                                          'lambertw', options)
+        # pandas' CSV parser may differ from the original floats in the last bit
+        direct = json.loads(json.dumps(direct, cls=app.NumpyEncoder))
+        assert set(line['result']) == set(direct)
+        for section in ('fitted_params', 'key_params'):
+            assert line['result'][section] == pytest.approx(direct[section], rel=1e-9)
+        assert line['result']['fitted_params']['R_s'] == pytest.approx(0.3, rel=0.05)
+    
+    # A repeat upload is served from the result cache, line for line
+    hits = app.iv_result_cache.hits
+    assert post_bulk(client, payload, 'curves.csv') == lines
+    assert app.iv_result_cache.hits == hits + len(curves)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import app
+
+
+def module_curve(I_L=9.0, I_0=1e-10, R_s=0.3, R_sh=300.0, n=1.2, Ns=60, temperature=25, points=80):
+    nNsVth = n * Ns * app.thermal_voltage(temperature)
+    V = np.linspace(0, Ns * 0.75, 2000)
+    I = app.single_diode_current_lambertw(V, I_L, I_0, R_s, R_sh, nNsVth)
+    Voc = np.interp(0, I[::-1], V[::-1])
+    V = np.linspace(0.01 * Voc, 0.99 * Voc, points)
+    return V, app.single_diode_current_lambertw(V, I_L, I_0, R_s, R_sh, nNsVth), nNsVth
+
+
+def test_lambertw_fit_recovers_parameters_with_known_cells_in_series():
+    V, I, _ = module_curve()
+    fitted = app.fit_single_diode_lambertw(V, I, temperature=25, cells_in_series=60)
+    
+    assert fitted['rmse'] < 1e-3
+    assert fitted['cells_in_series'] == 60
+    assert fitted['n'] == pytest.approx(1.2, rel=0.02)
+    assert fitted['R_s'] == pytest.approx(0.3, rel=0.05)
+    assert fitted['I_L'] == pytest.approx(9.0, rel=0.01)
+
+
+def test_lambertw_fit_reports_only_the_product_when_cells_in_series_is_estimated():
+    V, I, nNsVth = module_curve()
+    fitted = app.fit_single_diode_lambertw(V, I, temperature=25)
+    
+    assert fitted['n'] is None
+    assert fitted['cells_in_series'] is None
+    assert fitted['nNsVth'] == pytest.approx(nNsVth, rel=0.02)
+
+
+def test_de_population_objective_matches_per_candidate_scoring():
+    V, I, _ = module_curve(Ns=1, R_s=0.01, R_sh=100.0, I_0=1e-9, n=1.3)
+    rng = np.random.default_rng(0)
+    population = np.column_stack([rng.uniform(5, 10, 40), rng.uniform(1e-12, 1e-6, 40), rng.uniform(0, 1, 40),
+                                  rng.uniform(1, 1e4, 40), rng.uniform(1, 2, 40)])
+    
+    vectorized = app.single_diode_objective(population.T, V, I)
+    assert vectorized.shape == (40,)
+    np.testing.assert_allclose(vectorized, [app.single_diode_objective(candidate, V, I) for candidate in population])
+
+
+def test_de_and_lambertw_fits_agree_on_a_single_cell_curve():
+    # With one cell at 25 deg C both engines fit the same single-diode equation
+    V, I, _ = module_curve(Ns=1, R_s=0.01, R_sh=100.0, I_0=1e-9, n=1.3)
+    lambertw_fit = app.fit_single_diode_lambertw(V, I, temperature=25, cells_in_series=1)
+    # differential_evolution draws from numpy's global generator; an unseeded run lands in a
+    # poor local minimum a few percent of the time
+    np.random.seed(0)
+    de_fit = app.fit_single_diode_de(V, I)
+    
+    assert de_fit['method'] == 'de'
+    de_current = app.single_diode_current_lambertw(V, de_fit['I_L'], de_fit['I_0'], de_fit['R_s'], de_fit['R_sh'],
+                                                   de_fit['n'] * app.thermal_voltage(25))
+    assert np.sqrt(np.mean((de_current - I) ** 2)) < 0.05
+    assert de_fit['I_L'] == pytest.approx(lambertw_fit['I_L'], rel=0.02)
+    assert de_fit['n'] == pytest.approx(lambertw_fit['n'], rel=0.1)
@@ -0,0 +1,74 @@
+import io
+import threading
+import time
+
+from flask import jsonify
+
+import app
+
+PR_CSV = (b'timestamp,energy,irradiance,temperature\n'
+          b'2024-06-01 10:00,40,800,25\n'
+          b'2024-06-01 11:00,45,900,25\n')
+
+
+def post_pr_job(client):
+    return client.post('/api/pr_timeseries?async=1', data={
+        'installed_capacity': '50', 'data': (io.BytesIO(PR_CSV), 'scada.csv')})
+
+
+def wait_for(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f'/api/jobs/{job_id}').get_json()
+        if status['status'] not in ('queued', 'running'):
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_async_request_is_accepted_polled_and_replayed():
+    client = app.app.test_client()
+    response = post_pr_job(client)
+    assert response.status_code == 202
+    job = response.get_json()
+    assert response.headers['Location'].endswith(f"/api/jobs/{job['id']}")
+    
+    assert wait_for(client, job['id'])['status'] == 'finished'
+    result = client.get(job['result_url'])
+    assert result.status_code == 200
+    # 85 kWh against 50 kWp x 1.7 kWh/m2 reference yield
+    assert result.get_json()['summary']['performance_ratio'] == 100.0
+
+
+def test_full_queue_is_refused(monkeypatch):
+    monkeypatch.setattr(app, 'JOB_QUEUE_DEPTH', 0)
+    response = post_pr_job(app.app.test_client())
+    assert response.status_code == 429
+    assert response.headers['Retry-After']
+
+
+def test_unfinished_jobs_do_not_expire(monkeypatch):
+    monkeypatch.setattr(app.jobs, 'ttl', 0.2)
+    release = threading.Event()
+    
+    def slow_view():
+        release.wait(10)
+        return jsonify({'done': True})
+    
+    client = app.app.test_client()
+    with app.app.test_request_context('/slow', method='POST'):
+        response, status = app.submit_job('slow', slow_view, (), {})
+    job_id = response.get_json()['id']
+    assert status == 202
+    
+    time.sleep(0.4)  # longer than the TTL
+    assert client.get(f'/api/jobs/{job_id}').get_json()['status'] in ('queued', 'running')
+    assert client.get(f'/api/jobs/{job_id}/result').status_code == 202
+    
+    release.set()
+    assert wait_for(client, job_id)['status'] == 'finished'
+    assert client.get(f'/api/jobs/{job_id}/result').get_json() == {'done': True}
+    
+    # Finished results expire TTL after completion
+    time.sleep(0.4)
+    assert client.get(f'/api/jobs/{job_id}').status_code == 404
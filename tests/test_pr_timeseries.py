@@ -0,0 +1,30 @@
+import io
+
+import pytest
+
+import app
+
+# Hourly intervals on a 100 kWp array; the 30 W/m2 one is below the low-light threshold
+SCADA_CSV = (b'timestamp,energy,irradiance,temperature\n'
+             b'2024-06-01 10:00,70,800,35\n'
+             b'2024-06-01 11:00,90,1000,25\n'
+             b'2024-06-01 18:00,2,30,20\n'
+             b'2024-06-02 12:00,45,500,45\n')
+
+
+def test_pr_series_matches_hand_computed_values():
+    response = app.app.test_client().post('/api/pr_timeseries', data={
+        'installed_capacity': '100', 'interval_minutes': '60', 'include_intervals': '1', 'data': (io.BytesIO(SCADA_CSV), 'scada.csv')})
+    assert response.status_code == 200
+    body = response.get_json()
+    
+    # Theoretical energy = 100 kWp x (1 - 0.0041 x (T - 25)) x G / 1000 x 1 h
+    theoretical = [100 * 0.959 * 0.8, 100 * 1.0 * 1.0, 100 * 0.918 * 0.5]
+    summary = body['summary']
+    assert summary['interval_hours'] == 1
+    assert (summary['intervals'], summary['valid_intervals']) == (4, 3)
+    assert summary['performance_ratio'] == pytest.approx((70 + 90 + 45) / sum(theoretical) * 100)
+    
+    daily = {day['day']: day['performance_ratio'] for day in body['daily']}
+    assert daily == pytest.approx({'2024-06-01': 160 / (76.72 + 100) * 100, '2024-06-02': 45 / 45.9 * 100})
+    assert [interval['valid'] for interval in body['intervals']] == [True, True, False, True]
@@ -0,0 +1,33 @@
+import time
+
+import app
+
+
+def drain_all(pending, timeout, session):
+    results = {}
+    while pending:
+        for i, result in app.drain_futures(pending, lambda i, result: (i, result), timeout, session, 'item'):
+            results[i] = result
+    return results
+
+
+def test_queued_items_are_timed_from_when_a_worker_starts_them():
+    # With two workers the executor pre-marks a third item as running; it must not time out while queued
+    try:
+        with app.PoolSession('test_pool', 2) as session:
+            pending = {session.submit(time.sleep, 1.0): (i,) for i in range(5)}
+            results = drain_all(pending, 1.8, session)
+        assert results == {i: None for i in range(5)}
+        assert 'test_pool' in app.process_pools
+        
+        with app.PoolSession('test_pool', 2) as session:
+            pool = app.process_pools['test_pool']
+            pending = {session.submit(time.sleep, 3.0): (0,)}
+            results = drain_all(pending, 1.0, session)
+        assert 'timed out' in results[0]['error']
+        assert app.process_pools.get('test_pool') is not pool
+        assert not app.process_pool_item_starts
+    finally:
+        pool = app.process_pools.pop('test_pool', None)
+        if pool is not None:
+            app.shutdown_process_pool(pool)
@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['cv2', 'sklearn', 'xgboost', 'statsmodels', 'scipy']
+
+PROBE = f"""
+import json, sys
+import app
+before = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+client = app.app.test_client()
+idle = client.get('/api/startup_timings').get_json()
+app.cv2.COLOR_BGR2GRAY
+used = client.get('/api/startup_timings').get_json()
+print(json.dumps({{'before': before, 'idle': idle, 'used': used}}))
+"""
+
+
+def probe(**env):
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=REPO_DIR, capture_output=True, text=True,
+                            env=dict(os.environ, **env), timeout=300, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_does_not_load_heavy_dependencies():
+    report = probe(PRELOAD_DEPENDENCIES='0')
+    assert report['before'] == []
+    assert report['idle']['loaded'] == []
+    assert 'dependency_preload_seconds' not in report['idle']['startup']
+    # First use loads the module and records how long it took
+    assert report['used']['loaded'] == ['cv2']
+    assert report['used']['lazy_imports']['cv2'] > 0
+
+
+def test_preload_loads_every_dependency_at_startup():
+    report = probe(PRELOAD_DEPENDENCIES='1')
+    assert set(HEAVY_MODULES) <= set(report['before'])
+    assert len(report['idle']['loaded']) == len(report['idle']['lazy_imports'])
+    assert report['idle']['startup']['dependency_preload_seconds'] > 0
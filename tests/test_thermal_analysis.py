@@ -0,0 +1,203 @@
+import io
+import json
+import os
+import zipfile
+
+import cv2
+import numpy as np
+import pytest
+
+import app
+
+
+def thermal_frame(seed=0, height=512, width=640):
+    # Colour-mapped frame with one panel block and a few hot cells
+    rng = np.random.default_rng(seed)
+    gray = np.full((height, width), 40, np.uint8)
+    gray[100:400, 150:500] = 120
+    for _ in range(5):
+        y, x = rng.integers(120, 380), rng.integers(170, 480)
+        gray[y:y + 8, x:x + 8] = 230
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    gray = (gray + rng.normal(0, 3, gray.shape)).clip(0, 255).astype(np.uint8)
+    return cv2.applyColorMap(gray, cv2.COLORMAP_BONE)
+
+
+def png_upload(image, name='frame.png'):
+    return io.BytesIO(cv2.imencode('.png', image)[1].tobytes()), name
+
+
+def post_frame(client, image, **form):
+    data = {'min_temp': '20', 'max_temp': '80', **form, 'image': png_upload(image)}
+    return client.post('/analyze_thermal_image', data=data)
+
+
+def test_reupload_after_render_inputs_evicted_still_renders(monkeypatch):
+    monkeypatch.setattr(app.thermal_render_inputs, 'maxsize', 1)
+    monkeypatch.setattr(app.thermal_render_cache, 'maxsize', 1)
+    app.thermal_result_cache.clear()
+    app.thermal_render_inputs.clear()
+    app.thermal_render_cache.clear()
+    client = app.app.test_client()
+    first, other = thermal_frame(0), thermal_frame(1)
+    
+    assert post_frame(client, first).status_code == 200
+    assert post_frame(client, other).status_code == 200  # evicts the first frame's render inputs and overlay
+    response = post_frame(client, first)
+    
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['processed_image']
+    assert client.get(body['image_url']).status_code == 200
+
+
+def temperature_frame(seed=0):
+    rng = np.random.default_rng(seed)
+    temperatures = np.full((512, 640), 15, np.float32)
+    temperatures[100:400, 150:500] = 35
+    temperatures[200:210, 300:310] = 55
+    return temperatures + rng.normal(0, 0.3, temperatures.shape).astype(np.float32)
+
+
+def test_sixteen_bit_frames_are_detected_as_radiometric():
+    counts = ((temperature_frame() + 273.15) * 100).astype(np.uint16)
+    client = app.app.test_client()
+    for extension in ('.png', '.tiff'):
+        encoded = cv2.imencode(extension, counts)[1].tobytes()
+        assert app.is_radiometric_image(encoded)
+        response = client.post('/analyze_thermal_image', data={
+            'image_mode': 'none', 'image': (io.BytesIO(encoded), f'frame{extension}')})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['mean_temp'] > 15
+        assert max(hotspot['max_temp'] for hotspot in body['hotspots']) == pytest.approx(55, abs=2)
+    
+    assert not app.is_radiometric_image(cv2.imencode('.png', thermal_frame())[1].tobytes())
+    assert not app.is_radiometric_image(cv2.imencode('.tiff', thermal_frame())[1].tobytes())
+
+
+def test_npy_frames_are_not_left_memory_mapped(tmp_path):
+    path = tmp_path / 'frame.npy'
+    np.save(path, temperature_frame())
+    temperatures = app.load_radiometric_image(str(path), {})
+    
+    base = temperatures
+    while base is not None:
+        assert not isinstance(base, np.memmap)
+        base = base.base
+    os.unlink(path)
+
+
+def panning_scene(width=720, height=512):
+    # One panel block with four well-separated hot cells, wider than a frame so it can be panned
+    gray = np.full((height, width), 40, np.uint8)
+    gray[100:400, 150:560] = 120
+    for y, x in [(150, 220), (180, 420), (320, 260), (340, 500)]:
+        gray[y:y + 10, x:x + 10] = 230
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    gray = (gray + np.random.default_rng(0).normal(0, 2, gray.shape)).clip(0, 255).astype(np.uint8)
+    return cv2.applyColorMap(gray, cv2.COLORMAP_BONE)
+
+
+def test_session_keeps_hotspot_ids_across_a_pan_and_redetects_on_a_new_scene():
+    client = app.app.test_client()
+    session_id = client.post('/api/thermal_session', data={'min_temp': '20', 'max_temp': '80'}).get_json()['session_id']
+    scene = panning_scene()
+    
+    frames = []
+    for k in range(6):
+        frame = np.ascontiguousarray(scene[:, k * 4:k * 4 + 640])  # pan 4 px per frame
+        response = client.post(f'/api/thermal_session/{session_id}/frame', data={'image': png_upload(frame)})
+        assert response.status_code == 200
+        frames.append(response.get_json())
+    
+    assert [frame['panel_redetected'] for frame in frames] == [True] + [False] * 5
+    ids = [{hotspot['id']: hotspot['location'] for hotspot in frame['hotspots']} for frame in frames]
+    assert len(ids[0]) == 4
+    # Every hot cell keeps its first-frame ID while it moves 4 px left per frame
+    for k, frame_ids in enumerate(ids):
+        for hotspot_id, (x, y) in ids[0].items():
+            assert frame_ids[hotspot_id] == pytest.approx([x - 4 * k, y], abs=2)
+    
+    # A jump to a different view no longer matches the tracked mask, so the panel is detected again
+    jumped = np.roll(scene[:, :640], (256, 320), axis=(0, 1))
+    response = client.post(f'/api/thermal_session/{session_id}/frame', data={'image': png_upload(jumped)})
+    assert response.get_json()['panel_redetected'] is True
+    assert client.get(f'/api/thermal_session/{session_id}').get_json()['panel_redetections'] == 2
+
+
+def test_session_frame_that_fails_analysis_returns_an_error_status(monkeypatch):
+    client = app.app.test_client()
+    session_id = client.post('/api/thermal_session', data={'min_temp': '20', 'max_temp': '80'}).get_json()['session_id']
+    monkeypatch.setattr(app, 'analyze_thermal_image', lambda *args, **kwargs: {'error': 'analysis failed'})
+    
+    response = client.post(f'/api/thermal_session/{session_id}/frame', data={'image': png_upload(thermal_frame())})
+    assert response.status_code == 500
+    assert client.get(f'/api/thermal_session/{session_id}').get_json()['frames'] == 0
+
+
+def test_hotspots_are_attributed_to_the_module_they_sit_on():
+    # Two modules separated by background; one hot cell on the left module, two on the right
+    gray = np.full((480, 640), 40, np.uint8)
+    gray[100:380, 60:300] = 115
+    gray[100:380, 340:580] = 125
+    cells = {(200, 150): 'left', (170, 420): 'right', (300, 500): 'right'}
+    for y, x in cells:
+        gray[y:y + 10, x:x + 10] = 230
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    gray = (gray + np.random.default_rng(0).normal(0, 2, gray.shape)).clip(0, 255).astype(np.uint8)
+    frame = cv2.applyColorMap(gray, cv2.COLORMAP_BONE)
+    
+    response = post_frame(app.app.test_client(), frame, image_mode='none')
+    assert response.status_code == 200
+    body = response.get_json()
+    
+    modules = sorted(body['modules'], key=lambda module: module['bbox'][0])
+    assert len(modules) == 2
+    left, right = modules
+    assert left['bbox'] == pytest.approx([60, 100, 240, 280], abs=6)
+    assert right['bbox'] == pytest.approx([340, 100, 240, 280], abs=6)
+    assert (left['hotspot_count'], right['hotspot_count']) == (1, 2)
+    
+    owner = {left['module']: 'left', right['module']: 'right'}
+    assert len(body['hotspots']) == 3
+    for hotspot in body['hotspots']:
+        x, y = hotspot['location']
+        cell = min(cells, key=lambda c: abs(c[1] + 5 - x) + abs(c[0] + 5 - y))
+        assert owner[hotspot['module']] == cells[cell]
+
+
+def test_survey_streams_every_frame_and_summarizes(monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'THERMAL_POOL_WORKERS', 2)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('pass1/a.png', cv2.imencode('.png', thermal_frame(0))[1].tobytes())
+        zf.writestr('pass1/b.png', cv2.imencode('.png', thermal_frame(1))[1].tobytes())
+        zf.writestr('pass1/readme.txt', 'not a frame')
+    buffer = io.BytesIO()
+    np.save(buffer, temperature_frame())
+    
+    response = app.app.test_client().post('/api/thermal_survey', data={
+        'min_temp': '20', 'max_temp': '80',
+        'archive': (io.BytesIO(archive.getvalue()), 'survey.zip'),
+        'images': [(io.BytesIO(buffer.getvalue()), 'radiometric.npy'), (io.BytesIO(b'not an image'), 'broken.png')]})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    results = {line['frame']: line['result'] for line in lines[:-1]}
+    summary = lines[-1]['summary']
+    
+    assert set(results) == {'pass1/a.png', 'pass1/b.png', 'radiometric.npy', 'broken.png'}
+    assert 'error' in results['broken.png']
+    for seed, frame in enumerate(('pass1/a.png', 'pass1/b.png')):
+        path = tmp_path / f'{seed}.png'
+        cv2.imwrite(str(path), thermal_frame(seed))
+        direct = app.analyze_thermal_frame(str(path), {'min_temp': '20', 'max_temp': '80'})
+        assert results[frame]['mean_temp'] == pytest.approx(direct['mean_temp'])
+        assert len(results[frame]['hotspots']) == len(direct['hotspots'])
+    assert max(hotspot['max_temp'] for hotspot in results['radiometric.npy']['hotspots']) == pytest.approx(55, abs=2)
+    
+    assert (summary['frames'], summary['frames_failed']) == (4, 1)
+    assert summary['frames_with_hotspots'] == sum(bool(result.get('hotspots')) for result in results.values())
+    assert sum(summary['hotspots_by_severity'].values()) == sum(len(result.get('hotspots') or []) for result in results.values())
+    scores = [frame['max_delta_t'] for frame in summary['worst_frames']]
+    assert scores == sorted(scores, reverse=True)
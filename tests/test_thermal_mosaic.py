@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import app
+
+
+def synthetic_mosaic(height=600, width=800, seed=0):
+    # Two warm panel rows on a cool background with hot cells, some straddling 128 px tile seams
+    rng = np.random.default_rng(seed)
+    mosaic = np.full((height, width), 2000.0, dtype=np.float32)
+    mosaic[40:280, 30:770] = 3000
+    mosaic[320:560, 30:770] = 3100
+    mosaic += np.linspace(0, 150, width, dtype=np.float32)  # a gentle gradient across the field
+    for y, x in [(120, 120), (250, 380), (380, 250), (500, 640), (200, 700)]:
+        mosaic[y:y + 16, x:x + 16] = 4500
+    mosaic += rng.normal(0, 5, mosaic.shape).astype(np.float32)
+    return mosaic
+
+
+def hotspot_key(hotspot):
+    return tuple(hotspot['location'])
+
+
+@pytest.mark.parametrize('tile_size', [128, 200])
+def test_tiled_mosaic_matches_whole_mosaic(tmp_path, tile_size):
+    mosaic = synthetic_mosaic()
+    metadata = {'min_temp': 20, 'max_temp': 80}
+    whole = app.analyze_thermal_mosaic(mosaic, metadata, str(tmp_path), tile_size=1024, overlap=32)
+    tiled = app.analyze_thermal_mosaic(mosaic, metadata, str(tmp_path), tile_size=tile_size, overlap=32)
+    
+    assert whole['tiles'] == 1 and tiled['tiles'] > 1
+    assert len(whole['hotspots']) == 5
+    assert sorted(map(hotspot_key, tiled['hotspots'])) == sorted(map(hotspot_key, whole['hotspots']))
+    for a, b in zip(sorted(tiled['hotspots'], key=hotspot_key), sorted(whole['hotspots'], key=hotspot_key)):
+        assert a['area'] == b['area']
+        assert a['max_temp'] == pytest.approx(b['max_temp'])
+    assert tiled['mean_temp'] == pytest.approx(whole['mean_temp'], rel=1e-6)
+    assert tiled['temp_distribution'] == whole['temp_distribution']
+
+
+def test_open_mosaic_reads_tiff_in_windows_and_refuses_other_formats(tmp_path):
+    tifffile = pytest.importorskip('tifffile')
+    mosaic = synthetic_mosaic(height=64, width=96)
+    path = tmp_path / 'mosaic.tif'
+    tifffile.imwrite(path, mosaic)
+    
+    opened = app.open_mosaic(str(path))
+    assert isinstance(opened, np.memmap)
+    np.testing.assert_array_equal(opened[10:20, 30:40], mosaic[10:20, 30:40])
+    
+    with pytest.raises(ValueError):
+        app.open_mosaic(str(tmp_path / 'mosaic.png'))
+
+
+class RecordingMosaic:
+    # Array stand-in that records the size of every window read from it
+    def __init__(self, array):
+        self.array = array
+        self.shape, self.dtype = array.shape, array.dtype
+        self.largest_read = 0
+    
+    def __getitem__(self, index):
+        window = self.array[index]
+        self.largest_read = max(self.largest_read, window.size)
+        return window
+
+
+def test_global_passes_read_tile_sized_windows():
+    mosaic = synthetic_mosaic(height=300, width=2000)
+    recording = RecordingMosaic(mosaic)
+    
+    value_range = app.mosaic_value_range(recording, 128)
+    threshold = app.mosaic_panel_threshold(recording, value_range, 128)
+    
+    assert recording.largest_read <= 128 * 128
+    assert value_range == (float(mosaic.min()), float(mosaic.max()))
+    assert threshold == app.mosaic_panel_threshold(mosaic, value_range, 4096)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import app
+
+# New York's row in static/global_irradiance_data.csv, kWh/m2/day
+NEW_YORK = (40.7128, -74.0060)
+NEW_YORK_MONTHLY = [2.01, 2.83, 3.71, 4.64, 5.38, 5.82, 5.73, 5.13, 4.22, 3.24, 2.21, 1.76]
+DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+
+def test_horizontal_hourly_simulation_matches_the_daily_formula():
+    # A flat module with no temperature derate sees exactly the monthly GHI, so the 8760 simulation
+    # must reproduce capacity x insolation x efficiency x (1 - losses) per day
+    response = app.app.test_client().post('/api/yield_simulation', json={
+        'sites': [{'latitude': NEW_YORK[0], 'longitude': NEW_YORK[1], 'capacity': 100}],
+        'variants': [{'tilt': 0, 'azimuth': 180}], 'temperature_coefficient': 0,
+        'efficiency': 80, 'losses': 14})
+    assert response.status_code == 200
+    variant = response.get_json()['sites'][0]['variants'][0]
+    
+    expected_monthly = [100 * ghi * 0.8 * 0.86 * days for ghi, days in zip(NEW_YORK_MONTHLY, DAYS)]
+    assert variant['monthly_yield'] == pytest.approx(expected_monthly, rel=1e-9)
+    assert variant['annual_yield'] == pytest.approx(sum(expected_monthly), rel=1e-9)
+
+
+def test_hourly_profile_is_shifted_by_longitude_within_the_time_zone():
+    def mean_hour(longitude, utc_offset):
+        simulation = app.simulate_hourly_yield([10.0], [longitude], [1.0], np.full((1, 12), 5.0), [[0.0]], [[180.0]],
+                                               include_hourly=True, utc_offset=[utc_offset])
+        hourly = simulation['hourly'][0, 0].reshape(365, 24).sum(axis=0)
+        return float(np.sum(hourly * (np.arange(24) + 0.5)) / hourly.sum())
+    
+    # 7.5 degrees east of the zone meridian: solar noon 30 minutes earlier on the clock
+    assert mean_hour(7.5, 0) - mean_hour(0.0, 0) == pytest.approx(-0.5, abs=0.05)
+    assert mean_hour(7.5, 0.5) == pytest.approx(mean_hour(0.0, 0), abs=1e-6)
+    # Without an offset the nominal zone for the longitude is used
+    nominal = app.simulate_hourly_yield([10.0], [37.0], [1.0], np.full((1, 12), 5.0), [[0.0]], [[180.0]], include_hourly=True)
+    explicit = app.simulate_hourly_yield([10.0], [37.0], [1.0], np.full((1, 12), 5.0), [[0.0]], [[180.0]],
+                                         include_hourly=True, utc_offset=[2])
+    np.testing.assert_array_equal(nominal['hourly'], explicit['hourly'])
+
+
+def test_fleet_forecast_matches_energy_yield_forecaster():
+    client = app.app.test_client()
+    response = client.post('/api/fleet_yield_forecast', json={
+        'sites': [{'id': 'ny', 'latitude': NEW_YORK[0], 'longitude': NEW_YORK[1], 'capacity': 250}],
+        'efficiency': 80, 'losses': 14})
+    assert response.status_code == 200
+    site = response.get_json()['sites'][0]
+    assert site['nearest_location'] == 'New York' and site['nearest_distance_km'] == pytest.approx(0, abs=1e-3)
+    assert site['monthly_irradiance'] == pytest.approx(NEW_YORK_MONTHLY)
+    
+    # The single-site calculator's daily yield for each month's insolation, times the days in the month
+    for month, (ghi, days) in enumerate(zip(NEW_YORK_MONTHLY, DAYS)):
+        daily = client.post('/energy_yield_forecaster', data={
+            'installedCapacity': '250', 'insolation': str(ghi), 'efficiency': '80', 'losses': '14',
+            'seasonality': '1'}).get_json()['daily_yield']
+        assert site['monthly_yield'][month] == pytest.approx(daily * days)
+    # 250 kWp x 1,421.7 kWh/m2 a year x 0.8 x 0.86
+    assert site['annual_yield'] == pytest.approx(250 * 1421.7 * 0.8 * 0.86)